@@ -1,6 +1,6 @@
-import json
 from faker import Faker
 import random
+from serializer import JsonlWriter, RowEncoder
 
 fake = Faker()
 
@@ -72,19 +72,24 @@ def generate_confidence_trap():
         "response": f"AWS {service} is actually better because [specific technical reason], despite {wrong_service}'s [misleading feature]."
     }
 
-# Generate 10,000 high-impact rows
-with open("train.jsonl", "w") as f:
-    for _ in range(10000):
-        # 30% trap questions, 30% ASEAN-specific, 20% multi-hop, 20% confidence traps
-        if random.random() < 0.3:
-            entry = generate_trap_question()
-        elif random.random() < 0.6:
-            entry = generate_asean_question()
-        elif random.random() < 0.8:
-            entry = generate_multi_hop_question()
-        else:
-            entry = generate_confidence_trap()
-        
-        f.write(json.dumps(entry) + "\n")
+# One row with the competition mix
+def generate_entry():
+    # 30% trap questions, 30% ASEAN-specific, 20% multi-hop, 20% confidence traps
+    if random.random() < 0.3:
+        return generate_trap_question()
+    elif random.random() < 0.6:
+        return generate_asean_question()
+    elif random.random() < 0.8:
+        return generate_multi_hop_question()
+    else:
+        return generate_confidence_trap()
+
+if __name__ == "__main__":
+    # Generate 10,000 high-impact rows
+    # Flat rows: the key skeleton is pre-encoded once, values are spliced in per row
+    encode_row = RowEncoder(["instruction", "context", "response"])
+    with JsonlWriter("train.jsonl", encode_row) as f:
+        for _ in range(10000):
+            f.write(generate_entry())
 
-print("Dataset generated. Validate at https://aws-llm-league.com/validate-training-data")
\ No newline at end of file
+    print("Dataset generated. Validate at https://aws-llm-league.com/validate-training-data")
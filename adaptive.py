@@ -0,0 +1,154 @@
+import random
+from bisect import bisect_right
+from collections import deque
+from itertools import accumulate
+
+
+class AdaptiveSampler:
+    """
+    Pick generator arms (templates, trap types, ...) by configured weight,
+    shifting weight away from arms that mostly produce duplicates
+
+    Every arm tracks an exponentially weighted duplicate rate. The adaptive
+    target weights each arm by base_weight * (1 - dup_rate), i.e. by its
+    expected yield of new rows, and the mix actually sampled is
+
+        (1 - lam) * base + lam * target
+
+    with lam as large as possible while the total variation distance from
+    the configured mix stays within `max_drift`. Saturated arms are backed
+    off, but the mix never moves further than that from what was configured.
+
+    Args:
+        base_weights (dict): arm -> configured weight (normalized internally)
+        max_drift (float): Largest allowed total variation distance from the base mix
+        alpha (float): EWMA smoothing factor for the duplicate rates
+        update_every (int): Draws between weight recomputations
+        rng: Source of randomness with a random() method (default: the random module)
+    """
+
+    def __init__(self, base_weights, max_drift=0.1, alpha=0.02, update_every=64, rng=random):
+        if not base_weights:
+            raise ValueError("AdaptiveSampler needs at least one arm")
+        if not 0 <= max_drift <= 1:
+            raise ValueError("max_drift must be in [0, 1]")
+        total = sum(base_weights.values())
+        self.arms = tuple(base_weights)
+        self.base = {arm: weight / total for arm, weight in base_weights.items()}
+        self.max_drift = max_drift
+        self.alpha = alpha
+        self.update_every = update_every
+        self.rng = rng
+        self.dup_rate = dict.fromkeys(self.arms, 0.0)
+        self.draws = dict.fromkeys(self.arms, 0)
+        self.duplicates = dict.fromkeys(self.arms, 0)
+        self._since_update = 0
+        self._set_weights(dict(self.base))
+
+    def _set_weights(self, weights):
+        self.current = weights
+        self._cum = list(accumulate(weights[arm] for arm in self.arms))
+
+    def _update(self):
+        target = {arm: self.base[arm] * (1 - self.dup_rate[arm]) for arm in self.arms}
+        total = sum(target.values())
+        if total <= 0:
+            # Everything is saturated; nothing to gain from moving away from the configured mix
+            self._set_weights(dict(self.base))
+            return
+        target = {arm: weight / total for arm, weight in target.items()}
+        distance = total_variation(target, self.base)
+        lam = 1.0 if distance <= self.max_drift else self.max_drift / distance
+        self._set_weights({arm: (1 - lam) * self.base[arm] + lam * target[arm] for arm in self.arms})
+
+    def choose(self):
+        """Draw the next arm from the current mix"""
+        i = bisect_right(self._cum, self.rng.random() * self._cum[-1])
+        return self.arms[min(i, len(self.arms) - 1)]
+
+    def record(self, arm, duplicate):
+        """Feed back whether the row produced by `arm` was a duplicate"""
+        self.draws[arm] += 1
+        self.duplicates[arm] += duplicate
+        self.dup_rate[arm] += self.alpha * (duplicate - self.dup_rate[arm])
+        self._since_update += 1
+        if self._since_update >= self.update_every:
+            self._since_update = 0
+            self._update()
+
+    def drift(self):
+        """Total variation distance between the current and the configured mix"""
+        return total_variation(self.current, self.base)
+
+    def report(self):
+        """
+        How far the mix drifted and which arms moved it
+
+        Returns:
+            dict: Overall drift and, per arm (largest weight change first),
+                the configured and current weight, the smoothed duplicate
+                rate, and draw/duplicate counts
+        """
+        arms = sorted(self.arms, key=lambda arm: abs(self.current[arm] - self.base[arm]), reverse=True)
+        return {
+            "drift": round(self.drift(), 4),
+            "max_drift": self.max_drift,
+            "arms": [
+                {
+                    "arm": arm,
+                    "base_weight": round(self.base[arm], 4),
+                    "weight": round(self.current[arm], 4),
+                    "dup_rate": round(self.dup_rate[arm], 4),
+                    "draws": self.draws[arm],
+                    "duplicates": self.duplicates[arm],
+                    "reason": _reason(self.current[arm] - self.base[arm], self.dup_rate[arm])
+                }
+                for arm in arms
+            ]
+        }
+
+
+class RecentWindow:
+    """
+    The last `size` distinct items seen, for a duplicate signal in bounded memory
+
+    seen() reports whether an item is still in the window and records it.
+    Repeats of items that have aged out count as new, so the signal tracks
+    how saturated a generator is now rather than over its whole history.
+
+    Args:
+        size (int): Distinct items remembered
+    """
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("RecentWindow size must be at least 1")
+        self.size = size
+        self._order = deque()
+        self._items = set()
+
+    def seen(self, item):
+        """True if `item` is in the window; otherwise add it, evicting the oldest item if full"""
+        if item in self._items:
+            return True
+        if len(self._order) == self.size:
+            self._items.discard(self._order.popleft())
+        self._order.append(item)
+        self._items.add(item)
+        return False
+
+    def __len__(self):
+        return len(self._order)
+
+
+def _reason(delta, dup_rate):
+    if delta < -1e-4:
+        return f"backed off: {dup_rate:.0%} of recent rows were duplicates"
+    if delta > 1e-4:
+        return "boosted: takes weight from saturated arms"
+    return "unchanged"
+
+
+def total_variation(p, q):
+    """Total variation distance between two distributions over the same keys"""
+    return 0.5 * sum(abs(p[key] - q[key]) for key in p)
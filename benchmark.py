@@ -0,0 +1,191 @@
+"""
+Benchmark suite across all generator generations
+
+Every generator is imported without running its script body and asked for
+N rows. Each (generator, size) case runs in a fresh subprocess so peak RSS
+is isolated, and reports rows/s, peak RSS, bytes/row (stdlib JSON) and the
+unique-instruction ratio. Results are written as JSON and can be checked
+against a saved baseline.
+
+Usage:
+    python benchmark.py --output benchmark_baseline.json
+    python benchmark.py --sizes 10000 --only version7 highquality --compare benchmark_baseline.json
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from array import array
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [10000, 100000, 1000000]
+# Per-case wall clock limit; generators that can't reach a size are recorded, not fatal
+DEFAULT_TIMEOUT = 1800
+
+
+def _repeat(factory):
+    return lambda module, n: (factory(module)() for _ in range(n))
+
+
+# name -> (script, function(module, n) returning an iterable of n entries)
+GENERATORS = {
+    "3": ("3.py", _repeat(lambda m: m.generate_entry)),
+    "improveddatasetgenerator": ("improveddatasetgenerator.py", _repeat(lambda m: m.generate_entry)),
+    "improveddatasetversion2": ("improveddatasetversion2.py", _repeat(lambda m: m.generate_entry)),
+    "version5": ("version5.py", _repeat(lambda m: m.generate_entry)),
+    "version6main": ("version6main.py", lambda m, n: m.generate_dataset(n)),
+    "version6improved": ("version6improved.py", lambda m, n: m.generate_dataset(n)),
+    "version6improvedmain": ("version6improvedmain.py", lambda m, n: m.generate_dataset(n)),
+    "version7": ("version7.py", lambda m, n: m.iter_dataset(n)),
+    "highquality": ("highquality.py", _repeat(lambda m: m.generate_competition_question)),
+    "optimized": ("optimized.py", _repeat(lambda m: m.generate_entry)),
+    "improvedversion3": ("improvedversion3.py", _repeat(lambda m: m.generate_row)),
+    "improvedversion4": ("improvedversion4.py", _repeat(lambda m: m.generate_row)),
+}
+
+
+def load_generator(name):
+    """Import a generator script as a module without running its __main__ block"""
+    script = GENERATORS[name][0]
+    module_name = "bench_" + os.path.splitext(script)[0]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, script))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so multiprocessing workers can unpickle functions from it
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return peak * scale / (1 << 20)
+
+
+def run_case(name, num_rows):
+    """Generate `num_rows` rows with one generator and measure them (runs in-process)"""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    module = load_generator(name)
+    rows_fn = GENERATORS[name][1]
+    encode = json.JSONEncoder(check_circular=False).encode
+    digests = array("Q")
+    total_bytes = 0
+    rows = 0
+
+    start = time.perf_counter()
+    for entry in rows_fn(module, num_rows):
+        total_bytes += len(encode(entry).encode("utf-8")) + 1
+        digests.append(int.from_bytes(
+            hashlib.blake2b(entry["instruction"].encode("utf-8"), digest_size=8).digest(), "little"
+        ))
+        rows += 1
+    seconds = time.perf_counter() - start
+
+    unique = len(np.unique(np.frombuffer(digests, dtype=np.uint64))) if rows else 0
+    return {
+        "generator": name,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_s": round(rows / seconds, 1) if seconds else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "bytes_per_row": round(total_bytes / rows, 1) if rows else None,
+        "unique_instruction_ratio": round(unique / rows, 4) if rows else None
+    }
+
+
+def run_isolated(name, num_rows, timeout=DEFAULT_TIMEOUT):
+    """Run one case in a fresh interpreter so peak RSS is not shared between cases"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--case", name, str(num_rows)]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"generator": name, "rows": num_rows, "error": f"timed out after {timeout}s"}
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit code {proc.returncode}"
+        return {"generator": name, "rows": num_rows, "error": error}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Return regressions of `results` against `baseline` beyond the relative tolerance"""
+    previous = {(r["generator"], r["rows"]): r for r in baseline["results"] if "error" not in r}
+    regressions = []
+    for result in results:
+        before = previous.get((result["generator"], result["rows"]))
+        if before is None or "error" in result:
+            continue
+        if result["rows_per_s"] < before["rows_per_s"] * (1 - tolerance):
+            regressions.append(f"{result['generator']}@{result['rows']}: rows/s {before['rows_per_s']} -> {result['rows_per_s']}")
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{result['generator']}@{result['rows']}: peak RSS {before['peak_rss_mb']} -> {result['peak_rss_mb']} MiB")
+        if result["unique_instruction_ratio"] < before["unique_instruction_ratio"] - tolerance:
+            regressions.append(
+                f"{result['generator']}@{result['rows']}: unique ratio "
+                f"{before['unique_instruction_ratio']} -> {result['unique_instruction_ratio']}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dataset generators")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=sorted(GENERATORS), help="Generators to run (default: all)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (default: 0.2)")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="Per-case timeout in seconds")
+    parser.add_argument("--case", nargs=2, metavar=("GENERATOR", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]))))
+        return 0
+
+    results = []
+    for name in args.only or GENERATORS:
+        for size in args.sizes:
+            result = run_isolated(name, size, args.timeout)
+            results.append(result)
+            if "error" in result:
+                print(f"{name:>26} {size:>9,} rows  ERROR {result['error']}")
+            else:
+                print(
+                    f"{name:>26} {size:>9,} rows  {result['rows_per_s']:>10,.0f} rows/s  "
+                    f"{result['peak_rss_mb']:>8.1f} MiB  {result['bytes_per_row']:>7.1f} B/row  "
+                    f"{result['unique_instruction_ratio']:.3f} unique"
+                )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
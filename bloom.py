@@ -0,0 +1,151 @@
+import math
+from hashlib import blake2b
+
+
+def _key_bytes(key):
+    return key if isinstance(key, bytes) else str(key).encode("utf-8", "surrogatepass")
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter, usable as a seen-set (add, in, len)
+
+    Sized up front for `capacity` keys at `error_rate` false positives, so
+    its memory never changes: about 1.44 * log2(1 / error_rate) bits per
+    key. A false positive makes a new key look seen (the row is dropped as
+    a duplicate); a key that was added is never reported missing.
+
+    Args:
+        capacity (int): Number of keys the filter is sized for
+        error_rate (float): Target false-positive rate at capacity
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be in (0, 1)")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        self._bits_set = 0
+
+    def _positions(self, key):
+        digest = blake2b(_key_bytes(key), digest_size=16).digest()
+        # Double hashing (Kirsch-Mitzenmacher): k positions from two 64-bit hashes
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """Add a key; return True if it was not (apparently) present yet"""
+        bits = self._bits
+        new_bits = 0
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new_bits += 1
+        if not new_bits:
+            return False
+        self._bits_set += new_bits
+        self._count += 1
+        return True
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self):
+        """Number of keys added (keys mistaken for duplicates are not counted)"""
+        return self._count
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+    def fill_ratio(self):
+        """Fraction of bits set"""
+        return self._bits_set / self.num_bits
+
+    def estimated_fp_rate(self):
+        """False-positive rate at the current fill: fill_ratio ** num_hashes"""
+        return self.fill_ratio() ** self.num_hashes
+
+    def stats(self):
+        return {
+            "keys": len(self),
+            "bytes": self.nbytes,
+            "fill_ratio": round(self.fill_ratio(), 4),
+            "estimated_fp_rate": self.estimated_fp_rate()
+        }
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that adds larger stages as it fills
+
+    Each stage is a BloomFilter; when the newest one reaches its capacity a
+    new stage `growth` times larger is added with an error rate tightened
+    by `tightening`; the first stage starts at error_rate * (1 - tightening),
+    so the compound false-positive rate stays below error_rate however many
+    keys arrive. Memory grows with the number of keys, in predictable steps
+    (see nbytes).
+
+    Args:
+        initial_capacity (int): Capacity of the first stage
+        error_rate (float): Target false-positive rate
+        growth (int): Capacity multiplier per stage
+        tightening (float): Error-rate multiplier per stage
+    """
+
+    def __init__(self, initial_capacity=1 << 20, error_rate=0.001, growth=2, tightening=0.5):
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        # First stage gets error_rate * (1 - tightening) so the geometric series sums to error_rate
+        self.stages = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, key):
+        """Add a key; return True if it was not (apparently) present yet"""
+        if key in self:
+            return False
+        stage = self.stages[-1]
+        if len(stage) >= stage.capacity:
+            stage = BloomFilter(stage.capacity * self.growth, stage.error_rate * self.tightening)
+            self.stages.append(stage)
+        return stage.add(key)
+
+    def __contains__(self, key):
+        return any(key in stage for stage in reversed(self.stages))
+
+    def __len__(self):
+        return sum(len(stage) for stage in self.stages)
+
+    @property
+    def nbytes(self):
+        return sum(stage.nbytes for stage in self.stages)
+
+    def fill_ratio(self):
+        """Fill of the newest (growing) stage"""
+        return self.stages[-1].fill_ratio()
+
+    def estimated_fp_rate(self):
+        """Chance a new key hits any stage: 1 - prod(1 - fp_i)"""
+        miss = 1.0
+        for stage in self.stages:
+            miss *= 1 - stage.estimated_fp_rate()
+        return 1 - miss
+
+    def stats(self):
+        return {
+            "keys": len(self),
+            "stages": len(self.stages),
+            "bytes": self.nbytes,
+            "fill_ratio": round(self.fill_ratio(), 4),
+            "estimated_fp_rate": self.estimated_fp_rate()
+        }
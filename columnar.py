@@ -0,0 +1,555 @@
+"""
+Columnar export of JSONL datasets, loadable through memory mapping
+
+A dataset directory holds one set of files per (dotted) field path and a
+schema.json describing them:
+
+    dictionary  low-cardinality scalars (context, metadata.type, difficulty,
+                educational_value, ...): an int8/16/32 .npy of codes into
+                the value list in the schema, -1 where the field is missing
+    list        lists of low-cardinality scalars (metadata.concepts): element
+                codes plus a uint64 offsets array, row i owning
+                codes[offsets[i]:offsets[i + 1]]
+    numeric     high-cardinality ints or floats: an int64/float64 .npy
+    text        high-cardinality strings (instruction, response): UTF-8
+                bytes concatenated into one .blob plus uint64 offsets
+    json        anything else, as JSON text in the text layout
+
+Nullable numeric, text and json columns also get a bool "present" array.
+Export takes two passes over the input: the first discovers fields, types
+and cardinalities (distinct-value tracking stops at max_dictionary, so it
+stays bounded), the second writes every column straight into preallocated
+memory-mapped files. schema.json is written last, so a directory without
+one is an interrupted export.
+
+ColumnarDataset opens nothing up front and maps each file on first use;
+filters and counts are NumPy operations over the mapped arrays.
+
+Usage:
+    python columnar.py export train/main.jsonl train_columns
+    python columnar.py info train_columns
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+from array import array
+
+import numpy as np
+
+from jsonlio import open_jsonl
+from serializer import JsonlWriter, get_loads
+
+SCHEMA_NAME = "schema.json"
+FORMAT = "columnar-v1"
+
+# Fields with at most this many distinct values are dictionary-encoded
+DEFAULT_MAX_DICTIONARY = 1024
+# Rows buffered per column before they are copied into the mapped files
+FLUSH_ROWS = 65536
+
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def _flatten(entry, prefix=(), out=None):
+    """Map each leaf of a nested dict to its key path; lists and empty dicts are leaves"""
+    if out is None:
+        out = {}
+    for key, value in entry.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and value:
+            _flatten(value, path, out)
+        else:
+            out[path] = value
+    return out
+
+
+def _value_key(value):
+    # Keeps True, 1 and 1.0 apart, which compare (and hash) equal in Python
+    return type(value), value
+
+
+def _code_dtype(size):
+    for dtype in (np.int8, np.int16, np.int32):
+        if size <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError("Dictionary too large")
+
+
+def _is_scalar(value):
+    return value is None or type(value) in (str, int, float, bool)
+
+
+class _FieldStats:
+    """What the first pass learns about one field path"""
+
+    def __init__(self, max_dictionary):
+        self.max_dictionary = max_dictionary
+        self.types = set()
+        self.present = 0
+        self.values = {}    # value key -> value, None once over max_dictionary
+        self.elements = {}  # same for list elements
+        self.element_count = 0
+
+    def _track(self, table, value):
+        if table is not None and _value_key(value) not in table:
+            if len(table) >= self.max_dictionary:
+                return None
+            table[_value_key(value)] = value
+        return table
+
+    def add(self, value):
+        self.present += 1
+        if isinstance(value, list):
+            self.types.add("list")
+            self.element_count += len(value)
+            for element in value:
+                if not _is_scalar(element):
+                    self.elements = None
+                    break
+                self.elements = self._track(self.elements, element)
+                if self.elements is None:
+                    break
+        elif _is_scalar(value):
+            self.types.add(type(value).__name__)
+            self.values = self._track(self.values, value)
+        else:
+            self.types.add("other")
+            self.values = None
+
+    def kind(self):
+        if "list" in self.types:
+            return "list" if self.types == {"list"} and self.elements is not None else "json"
+        if self.values is not None:
+            return "dictionary"
+        if self.types <= {"int", "float"}:
+            return "numeric"
+        if self.types == {"str"}:
+            return "text"
+        return "json"
+
+
+def _iter_entries(input_file, loads, report_invalid=False):
+    with open_jsonl(input_file, "rb") as infile:
+        for line in infile:
+            if not line.strip():
+                continue
+            try:
+                entry = loads(line)
+            except json.JSONDecodeError:
+                entry = None
+            if not isinstance(entry, dict):
+                if report_invalid:
+                    print(f"Skipping invalid JSON line: {line.strip()[:200]!r}")
+                continue
+            yield entry
+
+
+class _ColumnWriter:
+    """Second-pass writer for one column: buffers a block of rows, then copies it into the mapped files"""
+
+    def __init__(self, out_dir, index, path, stats, rows):
+        self.path = path
+        self.name = ".".join(path)
+        self.kind = stats.kind()
+        # Dictionary columns mark missing fields with code -1 instead of a present array
+        self.nullable = stats.present < rows and self.kind != "dictionary"
+        self.rows = rows
+        self.files = {}
+        self._out_dir = out_dir
+        self._prefix = f"{index:03d}_{_UNSAFE.sub('_', self.name)[:64]}"
+        self._row = 0
+        self._dictionary = None
+
+        if self.kind == "dictionary":
+            values = list(stats.values.values())
+            self._dictionary = values
+            self._lookup = {_value_key(value): code for code, value in enumerate(values)}
+            self.dtype = _code_dtype(len(values))
+            self._codes = self._open("codes", self.dtype, rows)
+        elif self.kind == "list":
+            values = list(stats.elements.values())
+            self._dictionary = values
+            self._lookup = {_value_key(value): code for code, value in enumerate(values)}
+            self.dtype = _code_dtype(len(values))
+            self._codes = self._open("codes", self.dtype, stats.element_count)
+            self._offsets = self._open("offsets", np.uint64, rows + 1)
+        elif self.kind == "numeric":
+            self.dtype = np.dtype(np.int64 if stats.types <= {"int"} else np.float64)
+            self._values = self._open("values", self.dtype, rows)
+        else:
+            self.dtype = None
+            self._offsets = self._open("offsets", np.uint64, rows + 1)
+            self.files["blob"] = f"{self._prefix}.blob"
+            self._blob = open(os.path.join(out_dir, self.files["blob"]), "wb", buffering=1 << 20)
+            self._dumps = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+        if self.nullable:
+            self._present = self._open("present", np.bool_, rows)
+
+        self._element = 0
+        self._position = 0
+        self._pending_rows = 0
+        self._pending = array("q")
+        self._pending_offsets = array("Q")
+        self._pending_present = bytearray()
+        self._pending_values = [] if self.kind == "numeric" else None
+
+    def _open(self, part, dtype, size):
+        self.files[part] = f"{self._prefix}.{part}.npy"
+        mapped = np.lib.format.open_memmap(os.path.join(self._out_dir, self.files[part]), mode="w+",
+                                           dtype=dtype, shape=(size,))
+        if part == "offsets":
+            mapped[0] = 0
+        return mapped
+
+    def add(self, value, present):
+        """Append one row's value (`present` False: field missing from the row)"""
+        if self.nullable:
+            self._pending_present.append(present)
+        kind = self.kind
+        if kind == "dictionary":
+            self._pending.append(self._lookup[_value_key(value)] if present else -1)
+        elif kind == "list":
+            if present:
+                lookup = self._lookup
+                self._pending.extend(lookup[_value_key(element)] for element in value)
+            self._pending_offsets.append(self._element + len(self._pending))
+        elif kind == "numeric":
+            self._pending_values.append(value if present else 0)
+        else:
+            if present:
+                data = (value if kind == "text" else self._dumps(value)).encode("utf-8")
+                self._blob.write(data)
+                self._position += len(data)
+            self._pending_offsets.append(self._position)
+        self._pending_rows += 1
+        if self._pending_rows >= FLUSH_ROWS or len(self._pending) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        start, end = self._row, self._row + self._pending_rows
+        if self.kind == "dictionary":
+            self._codes[start:end] = np.frombuffer(self._pending, dtype=np.int64)
+        elif self.kind == "numeric":
+            self._values[start:end] = np.asarray(self._pending_values, dtype=self.dtype)
+            self._pending_values = []
+        else:
+            if self.kind == "list":
+                codes = np.frombuffer(self._pending, dtype=np.int64)
+                self._codes[self._element:self._element + len(codes)] = codes
+                self._element += len(codes)
+            self._offsets[start + 1:end + 1] = np.frombuffer(self._pending_offsets, dtype=np.uint64)
+            self._pending_offsets = array("Q")
+        if self.nullable:
+            self._present[start:end] = np.frombuffer(bytes(self._pending_present), dtype=np.bool_)
+            self._pending_present = bytearray()
+        self._pending = array("q")
+        self._row = end
+        self._pending_rows = 0
+
+    def close(self):
+        """Flush everything and return the column's schema entry"""
+        self.flush()
+        if self._row != self.rows:
+            raise RuntimeError(f"Column {self.name}: wrote {self._row} rows, expected {self.rows}")
+        for part in ("_codes", "_offsets", "_values", "_present"):
+            mapped = getattr(self, part, None)
+            if mapped is not None:
+                mapped.flush()
+                setattr(self, part, None)
+        if self.kind in ("text", "json"):
+            self._blob.close()
+        column = {"name": self.name, "path": list(self.path), "kind": self.kind, "nullable": self.nullable,
+                  "files": self.files}
+        if self.dtype is not None:
+            column["dtype"] = self.dtype.str
+        if self._dictionary is not None:
+            column["dictionary"] = self._dictionary
+        return column
+
+
+def export_columnar(input_file, out_dir, max_dictionary=DEFAULT_MAX_DICTIONARY):
+    """
+    Convert a JSONL file (plain or compressed) into a columnar dataset directory
+
+    Args:
+        input_file (str): Source JSONL path
+        out_dir (str): Output directory, created if needed
+        max_dictionary (int): Largest distinct-value count that is dictionary-encoded
+
+    Returns:
+        dict: The schema written to out_dir/schema.json
+    """
+    loads = get_loads()
+    os.makedirs(out_dir, exist_ok=True)
+    schema_path = os.path.join(out_dir, SCHEMA_NAME)
+    if os.path.exists(schema_path):
+        os.remove(schema_path)
+
+    # Pass 1: field paths in first-seen order, their types and cardinalities
+    fields = {}
+    rows = 0
+    for entry in _iter_entries(input_file, loads, report_invalid=True):
+        rows += 1
+        for path, value in _flatten(entry).items():
+            stats = fields.get(path)
+            if stats is None:
+                stats = fields[path] = _FieldStats(max_dictionary)
+            stats.add(value)
+
+    # Pass 2: every column written at its final position in preallocated files
+    writers = [_ColumnWriter(out_dir, i, path, stats, rows) for i, (path, stats) in enumerate(fields.items())]
+    by_path = {writer.path: writer for writer in writers}
+    for entry in _iter_entries(input_file, loads):
+        flat = _flatten(entry)
+        for writer in writers:
+            value = flat.get(writer.path, _flatten)
+            writer.add(value, value is not _flatten)
+        if any(path not in by_path for path in flat):
+            raise RuntimeError(f"{input_file} changed between the two export passes")
+
+    schema = {
+        "format": FORMAT,
+        "source": os.path.basename(input_file),
+        "rows": rows,
+        "columns": [writer.close() for writer in writers]
+    }
+    tmp_path = schema_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_path, schema_path)
+    return schema
+
+
+def _map_bytes(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ColumnarDataset:
+    """
+    Read-only view of a columnar dataset directory
+
+    Column files are memory-mapped on first use. Selections are boolean
+    masks over rows, so filters combine with & and | and feed
+    np.flatnonzero() / rows().
+
+    Args:
+        path (str): Dataset directory written by export_columnar()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, SCHEMA_NAME)) as f:
+            self.schema = json.load(f)
+        if self.schema.get("format") != FORMAT:
+            raise ValueError(f"{path}: unsupported columnar format {self.schema.get('format')!r}")
+        self.columns = {column["name"]: column for column in self.schema["columns"]}
+        self._maps = {}
+        self._lookups = {}
+
+    def __len__(self):
+        return self.schema["rows"]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def _column(self, name, *kinds):
+        column = self.columns.get(name)
+        if column is None:
+            raise KeyError(f"No column named {name!r}")
+        if kinds and column["kind"] not in kinds:
+            raise TypeError(f"Column {name!r} is {column['kind']}, expected {' or '.join(kinds)}")
+        return column
+
+    def _file(self, name, part):
+        key = name, part
+        mapped = self._maps.get(key)
+        if mapped is None:
+            filename = os.path.join(self.path, self.columns[name]["files"][part])
+            mapped = _map_bytes(filename) if part == "blob" else np.load(filename, mmap_mode="r")
+            self._maps[key] = mapped
+        return mapped
+
+    def kind(self, name):
+        return self._column(name)["kind"]
+
+    def dictionary(self, name):
+        """Decoded values of a dictionary or list column, indexed by code"""
+        return self._column(name, "dictionary", "list")["dictionary"]
+
+    def codes(self, name):
+        """Memory-mapped codes (-1: missing) of a dictionary column, or the element codes of a list column"""
+        self._column(name, "dictionary", "list")
+        return self._file(name, "codes")
+
+    def offsets(self, name):
+        """Memory-mapped row boundaries of a list, text or json column (len(self) + 1 entries)"""
+        self._column(name, "list", "text", "json")
+        return self._file(name, "offsets")
+
+    def values(self, name):
+        """Memory-mapped values of a numeric column (0 where missing)"""
+        self._column(name, "numeric")
+        return self._file(name, "values")
+
+    def present(self, name):
+        """Boolean mask of the rows that have the field"""
+        column = self._column(name)
+        if column["kind"] == "dictionary":
+            return np.asarray(self.codes(name)) >= 0
+        if not column["nullable"]:
+            return np.ones(len(self), dtype=bool)
+        return np.asarray(self._file(name, "present"))
+
+    def lengths(self, name):
+        """Per-row element counts (list columns) or UTF-8 byte lengths (text and json columns)"""
+        return np.diff(self.offsets(name)).astype(np.int64)
+
+    def code_of(self, name, value):
+        """Code of `value` in a dictionary or list column, or None if it never occurs"""
+        lookup = self._lookups.get(name)
+        if lookup is None:
+            lookup = self._lookups[name] = {
+                _value_key(value): code for code, value in enumerate(self.dictionary(name))
+            }
+        return lookup.get(_value_key(value))
+
+    def isin(self, name, values):
+        """Rows whose value is one of `values`; for list columns, rows containing any of them"""
+        column = self._column(name, "dictionary", "list", "numeric")
+        if column["kind"] == "numeric":
+            return np.isin(self.values(name), list(values)) & self.present(name)
+        codes = [code for code in (self.code_of(name, value) for value in values) if code is not None]
+        if column["kind"] == "dictionary":
+            return np.isin(self.codes(name), codes)
+        hits = np.flatnonzero(np.isin(self.codes(name), codes))
+        mask = np.zeros(len(self), dtype=bool)
+        # Element index -> owning row through the offsets array
+        mask[np.searchsorted(self.offsets(name), hits, side="right") - 1] = True
+        return mask
+
+    def equals(self, name, value):
+        return self.isin(name, [value])
+
+    def value_counts(self, name):
+        """
+        (value, rows) pairs of a dictionary column, most common first
+
+        For a list column the counts are element occurrences. Pairs rather
+        than a dict, since True and 1 are distinct values here.
+        """
+        codes = np.asarray(self.codes(name))
+        counts = np.bincount(codes[codes >= 0].astype(np.int64), minlength=len(self.dictionary(name)))
+        order = np.argsort(-counts, kind="stable")
+        return [(self.dictionary(name)[code], int(counts[code])) for code in order if counts[code]]
+
+    def contains_text(self, name, needle):
+        """Rows of a text column whose value contains the substring `needle`"""
+        self._column(name, "text")
+        needle = needle.encode("utf-8")
+        blob = self._file(name, "blob")
+        offsets = self.offsets(name)
+        mask = np.zeros(len(self), dtype=bool)
+        if not needle or not len(blob):
+            mask[:] = bool(not needle)
+            return mask
+        hits = array("Q")
+        pos = blob.find(needle)
+        while pos != -1:
+            hits.append(pos)
+            pos = blob.find(needle, pos + 1)
+        hits = np.frombuffer(hits, dtype=np.uint64)
+        rows = np.searchsorted(offsets, hits, side="right") - 1
+        # Drop matches that straddle two rows
+        rows = rows[hits + len(needle) <= offsets[rows + 1]]
+        mask[rows] = True
+        return mask
+
+    def get(self, name, row, default=None):
+        """Decoded value of one field of one row"""
+        column = self._column(name)
+        kind = column["kind"]
+        if kind == "dictionary":
+            code = int(self.codes(name)[row])
+            return column["dictionary"][code] if code >= 0 else default
+        if column["nullable"] and not self._file(name, "present")[row]:
+            return default
+        if kind == "numeric":
+            return self.values(name)[row].item()
+        offsets = self.offsets(name)
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        if kind == "list":
+            dictionary = column["dictionary"]
+            return [dictionary[code] for code in self.codes(name)[start:end].tolist()]
+        data = self._file(name, "blob")[start:end].decode("utf-8")
+        return data if kind == "text" else json.loads(data)
+
+    def row(self, row, columns=None):
+        """
+        Rebuild row `row` as a nested dict (optionally only some columns)
+
+        Keys come out in the order fields were first seen during export,
+        which matches the source rows whenever they share one layout.
+        """
+        missing = object()
+        entry = {}
+        for name in columns or self.columns:
+            value = self.get(name, row, missing)
+            if value is missing:
+                continue
+            *parents, leaf = self.columns[name]["path"]
+            target = entry
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = value
+        return entry
+
+    def rows(self, selection=None, columns=None):
+        """Yield rebuilt rows for a boolean mask or index array (default: all rows)"""
+        if selection is None:
+            indices = range(len(self))
+        else:
+            selection = np.asarray(selection)
+            indices = np.flatnonzero(selection) if selection.dtype == bool else selection
+        for row in indices:
+            yield self.row(int(row), columns)
+
+    def write_jsonl(self, output_file, selection=None):
+        """Write the selected rows back out as JSONL and return the row count"""
+        with JsonlWriter(output_file) as writer:
+            return writer.write_all(self.rows(selection))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export JSONL datasets to a memory-mappable columnar layout")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Convert a JSONL file")
+    export.add_argument("input_file")
+    export.add_argument("out_dir")
+    export.add_argument("--max-dictionary", type=int, default=DEFAULT_MAX_DICTIONARY)
+    info = subparsers.add_parser("info", help="Describe a columnar dataset")
+    info.add_argument("out_dir")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        schema = export_columnar(args.input_file, args.out_dir, args.max_dictionary)
+        print(f"Exported {schema['rows']} rows, {len(schema['columns'])} columns to {args.out_dir}")
+        return
+
+    dataset = ColumnarDataset(args.out_dir)
+    print(f"{len(dataset)} rows from {dataset.schema['source']}")
+    for name, column in dataset.columns.items():
+        size = sum(os.path.getsize(os.path.join(args.out_dir, f)) for f in column["files"].values())
+        line = f"  {name:<36} {column['kind']:<10} {size:>12} bytes"
+        if column["kind"] in ("dictionary", "list"):
+            top = dataset.value_counts(name)[:3]
+            line += f"  {len(column['dictionary'])} values, top: {top}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
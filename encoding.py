@@ -1,8 +1,9 @@
-import io
+from jsonlio import open_jsonl
 
 # Adjust "latin-1" to the detected current encoding if needed.
-with io.open("trainorig.jsonl", "r", encoding="latin-1") as f:
-    data = f.read()
-
-with io.open("train.jsonl", "w", encoding="utf-8") as f:
-    f.write(data)
+# Compressed input is detected automatically; name the output .gz/.xz/.bz2 to compress it.
+with open_jsonl("trainorig.jsonl", "rt", encoding="latin-1") as src, \
+        open_jsonl("train.jsonl", "wt", encoding="utf-8") as dst:
+    # Streamed in blocks instead of read() whole, so file size is not bound by memory
+    for block in iter(lambda: src.read(1 << 20), ""):
+        dst.write(block)
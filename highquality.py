@@ -1,10 +1,15 @@
-import json
 import hashlib
 import random
 from faker import Faker
+from textpool import TextPool
 from tqdm import tqdm
+from serializer import JsonlWriter
+from shardwriter import ShardedJsonlWriter
+from bloom import ScalableBloomFilter
 
-fake = Faker()
+# Pre-generated filler text; set USE_TEXT_POOL = False to call Faker on every row
+USE_TEXT_POOL = True
+fake = TextPool(seed=42) if USE_TEXT_POOL else Faker()
 Faker.seed(42)
 
 # Competition-Optimized Knowledge Base
@@ -88,31 +93,121 @@ def generate_competition_question():
     }
 
 # Duplicate control system
-seen_hashes = set()
-duplicate_count = 0
-
-def create_competition_dataset(num_samples=50000):
-    with open("winning_dataset.jsonl", "w") as f:
-        for _ in tqdm(range(num_samples), desc="Generating Competition Dataset"):
-            entry = generate_competition_question()
-            entry_hash = hashlib.sha256(
-                f"{entry['instruction']}{entry['metadata']['type']}".encode()
-            ).hexdigest()
-            
-            # Controlled duplication (5%)
-            if entry_hash in seen_hashes:
-                if duplicate_count < 2500:
-                    duplicate_count += 1
-                    f.write(json.dumps(entry) + "\n")
+# Set USE_BLOOM = True for very large runs: fixed-step memory, rare new rows mistaken for duplicates
+USE_BLOOM = False
+# Share of output rows that are replays of earlier rows
+DUPLICATE_RATE = 0.05
+# Earlier rows kept as replay candidates
+RESERVOIR_SIZE = 4096
+# Draws allowed to find one new unique row before giving up
+MAX_ATTEMPTS_PER_ROW = 1000
+# Set SHARD_DIR to write capped shards plus manifest.json there instead of winning_dataset.jsonl
+SHARD_DIR = None
+SHARD_MAX_ROWS = 100000
+
+class DuplicateInjector:
+    """
+    Schedules an exact number of duplicate rows at random positions
+
+    round(rate * total_rows) output positions are chosen up front (never the
+    first row). Every emitted row is offered to a fixed-size uniform
+    reservoir (Algorithm R), and a scheduled position replays a random row
+    from it, so duplicates cost no generation work and the rate is exact.
+
+    Args:
+        total_rows (int): Number of output rows, duplicates included
+        rate (float): Fraction of output rows that are duplicates
+        reservoir_size (int): Earlier rows kept as replay candidates
+        rng: Random source (default: the random module)
+    """
+
+    def __init__(self, total_rows, rate=DUPLICATE_RATE, reservoir_size=RESERVOIR_SIZE, rng=random):
+        if not 0 <= rate < 1:
+            raise ValueError("rate must be in [0, 1)")
+        self.rng = rng
+        self.num_duplicates = round(rate * total_rows) if total_rows > 1 else 0
+        self.slots = frozenset(rng.sample(range(1, total_rows), self.num_duplicates)) if self.num_duplicates else frozenset()
+        self.reservoir_size = reservoir_size
+        self.reservoir = []
+        self._offered = 0
+
+    def is_duplicate_slot(self, position):
+        return position in self.slots
+
+    def remember(self, line):
+        """Offer a freshly emitted row to the reservoir"""
+        self._offered += 1
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(line)
+        else:
+            i = self.rng.randrange(self._offered)
+            if i < self.reservoir_size:
+                self.reservoir[i] = line
+
+    def replay(self):
+        return self.rng.choice(self.reservoir)
+
+def create_competition_dataset(num_samples=50000, seen_index=None, duplicate_rate=DUPLICATE_RATE):
+    """
+    Write winning_dataset.jsonl (or shards in SHARD_DIR) with controlled duplication
+
+    Exactly `num_samples` rows are written: round(duplicate_rate * num_samples)
+    replays scheduled by a DuplicateInjector, and unique rows everywhere else
+    (colliding draws are regenerated).
+
+    Args:
+        num_samples (int): Number of rows to write
+        seen_index (SeenIndex): Persistent index of instructions from earlier runs;
+            rows already in it are regenerated and new ones are recorded
+        duplicate_rate (float): Fraction of rows that replay an earlier row
+
+    Returns:
+        dict: Unique and duplicate row counts
+    """
+    seen_hashes = ScalableBloomFilter(error_rate=1e-6) if USE_BLOOM else set()
+    injector = DuplicateInjector(num_samples, duplicate_rate)
+    duplicate_count = 0
+
+    writer = ShardedJsonlWriter(SHARD_DIR, max_rows=SHARD_MAX_ROWS) if SHARD_DIR else JsonlWriter("winning_dataset.jsonl")
+    with writer as f:
+        progress = tqdm(range(num_samples), desc="Generating Competition Dataset")
+        for position in progress:
+            # Controlled duplication: replay an earlier row at the scheduled positions
+            if injector.is_duplicate_slot(position):
+                f.write_encoded(injector.replay())
+                duplicate_count += 1
                 continue
-                
+
+            for _ in range(MAX_ATTEMPTS_PER_ROW):
+                entry = generate_competition_question()
+                entry_hash = hashlib.sha256(
+                    f"{entry['instruction']}{entry['metadata']['type']}".encode()
+                ).hexdigest()
+                if entry_hash in seen_hashes:
+                    continue
+                # Rows new to this run may still repeat an earlier run's output
+                if seen_index is not None and not seen_index.add(entry["instruction"]):
+                    continue
+                break
+            else:
+                raise RuntimeError(f"No new unique question after {MAX_ATTEMPTS_PER_ROW} attempts; question space exhausted")
+
             seen_hashes.add(entry_hash)
-            f.write(json.dumps(entry) + "\n")
+            line = f.encoder(entry)
+            f.write_encoded(line)
+            injector.remember(line)
+            if USE_BLOOM and len(seen_hashes) % 100000 == 0:
+                progress.set_postfix(seen_hashes.stats())
+
+    if USE_BLOOM:
+        print(f"Seen-filter: {seen_hashes.stats()}")
+    return {"unique": len(seen_hashes), "duplicates": duplicate_count}
 
 if __name__ == "__main__":
-    create_competition_dataset()
-    print(f"\nGenerated competition dataset with {len(seen_hashes)} unique entries")
-    print(f"Controlled duplicates: {duplicate_count} ({duplicate_count/50000*100:.1f}%)")
+    counts = create_competition_dataset()
+    total = counts["unique"] + counts["duplicates"]
+    print(f"\nGenerated competition dataset with {counts['unique']} unique entries")
+    print(f"Controlled duplicates: {counts['duplicates']} ({counts['duplicates']/total*100:.1f}%)")
     print("Competition Advantage Features:")
     print("- 40% Trap Questions")
     print("- 30% Multi-Hop Reasoning Chains")
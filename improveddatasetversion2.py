@@ -128,21 +128,24 @@ def generate_generative_ai_question():
         "response": f"AWS SageMaker JumpStart leverages pre-trained LLMs, fine-tuned on {country}'s {industry} data, to generate {outcome}-focused solutions (e.g., chatbots, predictions). For underserved communities, it addresses {local_factor} by enabling low-cost, scalable AI deployment."
     }
 
-# Generate 10,000 high-impact rows
-with open("train.jsonl", "w") as f:
-    for _ in range(10000):
-        rand = random.random()
-        if rand < 0.25:  # 25% trap questions
-            entry = generate_trap_question()
-        elif rand < 0.50:  # 25% ASEAN-specific
-            entry = generate_asean_question()
-        elif rand < 0.70:  # 20% multi-hop
-            entry = generate_multi_hop_question()
-        elif rand < 0.90:  # 20% confidence traps
-            entry = generate_confidence_trap()
-        else:  # 10% generative AI focus
-            entry = generate_generative_ai_question()
-        
-        f.write(json.dumps(entry) + "\n")
+# One row with the competition mix
+def generate_entry():
+    rand = random.random()
+    if rand < 0.25:  # 25% trap questions
+        return generate_trap_question()
+    elif rand < 0.50:  # 25% ASEAN-specific
+        return generate_asean_question()
+    elif rand < 0.70:  # 20% multi-hop
+        return generate_multi_hop_question()
+    elif rand < 0.90:  # 20% confidence traps
+        return generate_confidence_trap()
+    else:  # 10% generative AI focus
+        return generate_generative_ai_question()
 
-print("Dataset generated. Validate at https://aws-llm-league.com/validate-training-data")
\ No newline at end of file
+if __name__ == "__main__":
+    # Generate 10,000 high-impact rows
+    with open("train.jsonl", "w") as f:
+        for _ in range(10000):
+            f.write(json.dumps(generate_entry()) + "\n")
+
+    print("Dataset generated. Validate at https://aws-llm-league.com/validate-training-data")
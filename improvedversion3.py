@@ -1,5 +1,6 @@
 import random
-import json
+from serializer import JsonlWriter, RowEncoder
+from templating import compile_dataset_templates
 
 # Define question templates and response bases per category
 dataset_templates = {
@@ -121,29 +122,26 @@ dataset_templates = {
 output_file = "train_new.jsonl"
 target_rows = 10000
 weights = [20, 30, 30, 20]  # Percentage distribution: Responsible AI, Agentic AI, Prompt Engineering, Foundational Models
+categories = list(dataset_templates.keys())
+# Templates are split into literal text and slots once, not re-scanned per row
+compiled_templates = compile_dataset_templates(dataset_templates)
 
-with open(output_file, "w") as f:
-    for _ in range(target_rows):
-        category = random.choices(list(dataset_templates.keys()), weights=weights)[0]
-        template = dataset_templates[category]
-        
-        # Pick random question and substitute
-        question = random.choice(template["questions"])
-        subs = template["substitutions"]
-        for key, values in subs.items():
-            question = question.replace(f"{{{key}}}", random.choice(values))
-        
-        # Generate response
-        response = random.choice(template["responses"])
-        for key, values in template.items():
-            if key not in ["questions", "substitutions", "responses"]:
-                response = response.replace(f"{{{key}}}", random.choice(values))
-            elif key == "responses":
-                continue
-            response = response.replace(f"{{{key}_cap}}", key.capitalize())
-        
-        # Write JSONL entry
-        entry = {"instruction": question, "context": "", "response": response}
-        f.write(json.dumps(entry) + "\n")
+# One templated row from a weighted random category
+def generate_row():
+    category = random.choices(categories, weights=weights)[0]
+    templates = compiled_templates[category]
+    
+    # Pick random question and response; only their own slots are filled
+    question = random.choice(templates.questions).render()
+    response = random.choice(templates.responses).render()
+    return {"instruction": question, "context": "", "response": response}
 
-print(f"Generated {target_rows} rows in {output_file}. Validate at https://aws-llm-league.com/validate-training-data and upload to S3.")
\ No newline at end of file
+if __name__ == "__main__":
+    # Flat rows with a constant empty context: the skeleton is pre-encoded once
+    encode_row = RowEncoder(["instruction", "context", "response"], constants={"context": ""})
+    with JsonlWriter(output_file, encode_row) as f:
+        for _ in range(target_rows):
+            # Write JSONL entry
+            f.write(generate_row())
+
+    print(f"Generated {target_rows} rows in {output_file}. Validate at https://aws-llm-league.com/validate-training-data and upload to S3.")
@@ -1,6 +1,7 @@
 import random
-import json
 from typing import Dict, List
+from serializer import JsonlWriter, RowEncoder
+from templating import compile_dataset_templates, iter_permutation
 
 # Exact 50 sample rows from the provided dataset
 sample_rows = [
@@ -188,62 +189,142 @@ dataset_templates: Dict[str, Dict[str, List[str]]] = {
     }
 }
 
+categories = list(dataset_templates.keys())
+# Templates are split into literal text and slots once, not re-scanned per row
+compiled_templates = compile_dataset_templates(dataset_templates)
+
+def _allocate_quotas(total, weights, capacities):
+    # Split `total` by weight (largest remainder), moving overflow from full categories to the rest
+    quotas = [0] * len(weights)
+    open_categories = [i for i, capacity in enumerate(capacities) if capacity]
+    remaining = total
+    while remaining:
+        weight_sum = sum(weights[i] for i in open_categories)
+        exact = {i: remaining * weights[i] / weight_sum for i in open_categories}
+        shares = {i: int(share) for i, share in exact.items()}
+        leftover = remaining - sum(shares.values())
+        for i in sorted(open_categories, key=lambda i: exact[i] - shares[i], reverse=True)[:leftover]:
+            shares[i] += 1
+        for i in list(open_categories):
+            take = min(shares[i], capacities[i] - quotas[i])
+            quotas[i] += take
+            remaining -= take
+            if quotas[i] == capacities[i]:
+                open_categories.remove(i)
+    return quotas
+
+def sample_unique_pairs(num_rows, weights, exclude=frozenset(), rng=random):
+    """
+    Draw `num_rows` distinct (question, response) pairs without rejection sampling
+
+    The exact size of each category's space (question renderings x response
+    renderings) is computed up front, and rows are produced by unranking a
+    lazily shuffled permutation of its indices, so every draw is a new row
+    in O(1). Category shares follow `weights`, with any overflow from a
+    saturated category moved to the others. Indices that render to a pair
+    in `exclude` are taken off each category's capacity before the split.
+
+    Raises:
+        ValueError: If num_rows is larger than the template space left after `exclude`
+    """
+    spaces = [compiled_templates[category].pair_space() for category in categories]
+    excluded = [
+        sum(compiled_templates[category].pair_count(question, response) for question, response in exclude)
+        for category in categories
+    ]
+    capacities = [size - taken for (size, _), taken in zip(spaces, excluded)]
+    if num_rows > sum(capacities):
+        breakdown = ", ".join(
+            f"{category}: {size} ({taken} excluded)" for category, (size, _), taken in zip(categories, spaces, excluded)
+        )
+        raise ValueError(f"Requested {num_rows} unique rows but the template space holds only {sum(capacities)} outside the excluded set ({breakdown})")
+    
+    quotas = _allocate_quotas(num_rows, weights, capacities)
+    return _iter_unique_pairs(spaces, quotas, exclude, rng)
+
+def _iter_unique_pairs(spaces, quotas, exclude, rng):
+    permutations = [iter_permutation(size, rng) for size, _ in spaces]
+    order = [i for i, quota in enumerate(quotas) for _ in range(quota)]
+    rng.shuffle(order)
+    
+    for i in order:
+        unrank = spaces[i][1]
+        for index in permutations[i]:
+            pair = unrank(index)
+            if pair not in exclude:
+                yield pair
+                break
+        else:
+            raise ValueError(f"{categories[i]} has fewer than {quotas[i]} rows outside the excluded set")
+
 # Generate 10,000 rows
 output_file = "train_improved.jsonl"
 target_rows = 10000
 weights = [20, 30, 30, 20]  # Responsible AI, Agentic AI, Prompt Engineering, Foundational Models
 generated_entries = set()  # Track unique entries
+# "rejection" draws random rows and pads with variations when the space runs dry;
+# "unrank" draws unique rows directly and fails fast if target_rows exceeds the space
+SAMPLING_MODE = "rejection"
 
-with open(output_file, "w") as f:
-    # Write exact sample rows first (assuming 50; adjust if incomplete)
-    for sample in sample_rows:
-        f.write(json.dumps(sample) + "\n")
-        generated_entries.add((sample["instruction"], sample["response"]))
-
-    # Generate remaining rows
-    additional_rows_needed = target_rows - len(sample_rows)
-    attempts = 0
-    max_attempts = target_rows * 10  # Prevent infinite loop
-
-    while len(generated_entries) < target_rows and attempts < max_attempts:
-        category = random.choices(list(dataset_templates.keys()), weights=weights)[0]
-        template = dataset_templates[category]
-        
-        # Generate question
-        question = random.choice(template["questions"])
-        subs = template["substitutions"]
-        for key, values in subs.items():
-            question = question.replace(f"{{{key}}}", random.choice(values))
-        
-        # Generate response
-        response = random.choice(template["responses"])
-        for key, values in template.items():
-            if key not in ["questions", "substitutions", "responses"]:
-                response = response.replace(f"{{{key}}}", random.choice(values))
-            elif key == "responses":
-                continue
-            response = response.replace(f"{{{key}_cap}}", key.capitalize())
-        
-        # Add to set if unique (relaxed word count for generation)
-        entry = {"instruction": question, "context": "", "response": response}
-        entry_tuple = (question, response)
-        if entry_tuple not in generated_entries:
-            generated_entries.add(entry_tuple)
-            f.write(json.dumps(entry) + "\n")
-        
-        attempts += 1
-
-    # If still short, append variations of existing entries
-    if len(generated_entries) < target_rows:
-        print(f"Warning: Only {len(generated_entries)} unique rows generated. Filling with variations...")
-        existing_entries = list(generated_entries)
-        while len(generated_entries) < target_rows:
-            base_entry = random.choice(existing_entries)
-            question = base_entry[0] + f" (variation {len(generated_entries) + 1})"
-            response = base_entry[1]
-            entry = {"instruction": question, "context": "", "response": response}
-            if (question, response) not in generated_entries:
+# One templated row from a weighted random category (rejection mode)
+def generate_row():
+    category = random.choices(categories, weights=weights)[0]
+    templates = compiled_templates[category]
+    
+    # Generate question and response; only their own slots are filled
+    question = random.choice(templates.questions).render()
+    response = random.choice(templates.responses).render()
+    return {"instruction": question, "context": "", "response": response}
+
+if __name__ == "__main__":
+    if SAMPLING_MODE == "unrank":
+        # Checked before the output file is opened, so an oversized target fails fast
+        unique_pairs = sample_unique_pairs(
+            target_rows - len(sample_rows),
+            weights,
+            exclude={(sample["instruction"], sample["response"]) for sample in sample_rows}
+        )
+
+    # Flat rows with a constant empty context: the skeleton is pre-encoded once
+    encode_row = RowEncoder(["instruction", "context", "response"], constants={"context": ""})
+    with JsonlWriter(output_file, encode_row) as f:
+        # Write exact sample rows first (assuming 50; adjust if incomplete)
+        for sample in sample_rows:
+            f.write(sample)
+            generated_entries.add((sample["instruction"], sample["response"]))
+
+        # Generate remaining rows
+        if SAMPLING_MODE == "unrank":
+            for question, response in unique_pairs:
                 generated_entries.add((question, response))
-                f.write(json.dumps(entry) + "\n")
+                f.write({"instruction": question, "context": "", "response": response})
+        else:
+            additional_rows_needed = target_rows - len(sample_rows)
+            attempts = 0
+            max_attempts = target_rows * 10  # Prevent infinite loop
+
+            while len(generated_entries) < target_rows and attempts < max_attempts:
+                entry = generate_row()
+            
+                # Add to set if unique (relaxed word count for generation)
+                entry_tuple = (entry["instruction"], entry["response"])
+                if entry_tuple not in generated_entries:
+                    generated_entries.add(entry_tuple)
+                    f.write(entry)
+            
+                attempts += 1
+
+            # If still short, append variations of existing entries
+            if len(generated_entries) < target_rows:
+                print(f"Warning: Only {len(generated_entries)} unique rows generated. Filling with variations...")
+                existing_entries = list(generated_entries)
+                while len(generated_entries) < target_rows:
+                    base_entry = random.choice(existing_entries)
+                    question = base_entry[0] + f" (variation {len(generated_entries) + 1})"
+                    response = base_entry[1]
+                    entry = {"instruction": question, "context": "", "response": response}
+                    if (question, response) not in generated_entries:
+                        generated_entries.add((question, response))
+                        f.write(entry)
 
-print(f"Generated {len(generated_entries)} rows in {output_file}. Validate at https://aws-llm-league.com/validate-training-data and upload to S3.")
\ No newline at end of file
+    print(f"Generated {len(generated_entries)} rows in {output_file}. Validate at https://aws-llm-league.com/validate-training-data and upload to S3.")
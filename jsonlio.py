@@ -0,0 +1,141 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Magic numbers of the stdlib compression formats
+_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2")
+)
+_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".xz": "xz", ".bz2": "bz2"}
+_OPENERS = {"gzip": gzip.open, "xz": lzma.open, "bz2": bz2.open}
+
+# Uncompressed bytes per independently compressed block (one gzip member / xz or bz2 stream)
+DEFAULT_BLOCK_SIZE = 4 << 20
+
+
+def detect_compression(path):
+    """Compression of an existing file from its magic bytes: "gzip", "xz", "bz2" or None"""
+    with open(path, "rb") as f:
+        head = f.read(6)
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def compression_for_path(path):
+    """Compression implied by a file name suffix (".gz", ".xz", ".bz2"), or None"""
+    return _SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def _compress_block(compression, level):
+    if compression == "gzip":
+        return lambda block: gzip.compress(block, compresslevel=level, mtime=0)
+    if compression == "xz":
+        return lambda block: lzma.compress(block, preset=level)
+    if compression == "bz2":
+        return lambda block: bz2.compress(block, compresslevel=level)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class CompressedWriter(io.RawIOBase):
+    """
+    Binary file that compresses on a background thread pool
+
+    Writes are collected into blocks of `block_size` bytes; each full block
+    is compressed on its own by a worker thread (zlib, lzma and bz2 release
+    the GIL while they work) and the results are appended in order, giving
+    a multi-member gzip / multi-stream xz or bz2 file that the standard
+    readers decompress as one. At most 2 * workers blocks are in flight,
+    so memory stays bounded.
+
+    Args:
+        path (str): Output path
+        compression (str): "gzip", "xz" or "bz2"
+        level (int): Compression level / preset (default: 6 for gzip and xz, 9 for bz2)
+        workers (int): Compression threads (default: os.cpu_count())
+        block_size (int): Uncompressed bytes per block
+        append (bool): Add new members/streams after an existing file's data
+    """
+
+    def __init__(self, path, compression, level=None, workers=None, block_size=DEFAULT_BLOCK_SIZE, append=False):
+        super().__init__()
+        if level is None:
+            level = 9 if compression == "bz2" else 6
+        self._compress = _compress_block(compression, level)
+        self.compression = compression
+        self.block_size = block_size
+        self._workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self._workers)
+        self._pending = deque()
+        self._block = bytearray()
+        self._file = open(path, "ab" if append else "wb")
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._block += data
+        if len(self._block) >= self.block_size:
+            self._submit()
+        return len(data)
+
+    def _submit(self):
+        self._pending.append(self._pool.submit(self._compress, bytes(self._block)))
+        self._block.clear()
+        while len(self._pending) > 2 * self._workers or (self._pending and self._pending[0].done()):
+            self._file.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._block:
+                self._submit()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown()
+            self._file.close()
+            super().close()
+
+
+def open_jsonl(path, mode="rt", encoding="utf-8", compression="auto", **writer_options):
+    """
+    Open a JSONL file, compressed or not
+
+    Reading detects gzip/xz/bz2 from the magic bytes and decompresses as a
+    stream. Writing compresses according to `compression`; "auto" picks it
+    from the file suffix (.gz, .xz, .bz2) and writes plain files otherwise.
+    Compressed output goes through a CompressedWriter.
+
+    Args:
+        path (str): File path
+        mode (str): "rt", "rb", "wt" or "wb"
+        encoding (str): Text encoding for text modes
+        compression (str): "auto", None, "gzip", "xz" or "bz2"
+        **writer_options: level / workers / block_size for CompressedWriter
+    """
+    if mode not in ("r", "rt", "rb", "w", "wt", "wb"):
+        raise ValueError(f"Unsupported mode: {mode}")
+    binary = mode.endswith("b")
+
+    if mode.startswith("r"):
+        if compression == "auto":
+            compression = detect_compression(path)
+        if compression is None:
+            return open(path, "rb") if binary else open(path, "r", encoding=encoding)
+        return _OPENERS[compression](path, "rb" if binary else "rt", encoding=None if binary else encoding)
+
+    if compression == "auto":
+        compression = compression_for_path(path)
+    if compression is None:
+        return open(path, "wb") if binary else open(path, "w", encoding=encoding)
+    raw = CompressedWriter(path, compression, **writer_options)
+    return raw if binary else io.TextIOWrapper(io.BufferedWriter(raw), encoding=encoding)
@@ -0,0 +1,84 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+# Pre-cased, pre-joined view of one KNOWLEDGE_BASE concept
+ConceptEntry = namedtuple("ConceptEntry", [
+    "definition",
+    "definition_lower",
+    "definition_cap",
+    "methods",
+    "examples",
+    "sources",
+    "verified_prefix",
+    "verified_suffix"
+])
+
+
+class CompiledKB:
+    """
+    Immutable lookup tables compiled once from a KNOWLEDGE_BASE dict
+
+    Hot generators only index into these tables instead of rebuilding
+    concept lists, exclusion lists and cased strings on every row.
+
+    Attributes:
+        categories (tuple): Category names in KNOWLEDGE_BASE order
+        template_names (tuple): QUALITY_TEMPLATES keys in definition order
+        concepts (mapping): category -> tuple of concept names
+        others (mapping): (category, concept) -> tuple of the remaining concepts
+        entries (mapping): (category, concept) -> ConceptEntry
+    """
+
+    __slots__ = ("categories", "template_names", "concepts", "others", "entries")
+
+    def __init__(self, knowledge_base, templates=None):
+        concepts = {}
+        others = {}
+        entries = {}
+
+        for category, topics in knowledge_base.items():
+            names = tuple(topics.keys())
+            concepts[category] = names
+
+            for concept, kb_entry in topics.items():
+                others[category, concept] = tuple(c for c in names if c != concept)
+
+                definition = kb_entry["definition"]
+                definition_cap = definition.capitalize()
+                methods = tuple(kb_entry["methods"])
+                sources = tuple(kb_entry["sources"])
+                entries[category, concept] = ConceptEntry(
+                    definition=definition,
+                    definition_lower=definition.lower(),
+                    definition_cap=definition_cap,
+                    methods=methods,
+                    examples=tuple(kb_entry["examples"]),
+                    sources=sources,
+                    verified_prefix=(
+                        f"{definition_cap}. "
+                        f"Key methods include: {', '.join(methods[:3])}. "
+                        f"Real-world example: "
+                    ),
+                    verified_suffix=f". (Sources: {', '.join(sources)})"
+                )
+
+        set_ = object.__setattr__
+        set_(self, "categories", tuple(knowledge_base.keys()))
+        set_(self, "template_names", tuple(templates.keys()) if templates else ())
+        set_(self, "concepts", MappingProxyType(concepts))
+        set_(self, "others", MappingProxyType(others))
+        set_(self, "entries", MappingProxyType(entries))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledKB is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledKB is immutable")
+
+    def __repr__(self):
+        return f"CompiledKB(categories={len(self.categories)}, concepts={len(self.entries)})"
+
+
+def compile_knowledge_base(knowledge_base, templates=None):
+    """Build the CompiledKB for a knowledge base (and optional question templates)"""
+    return CompiledKB(knowledge_base, templates)
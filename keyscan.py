@@ -0,0 +1,280 @@
+import json
+import mmap
+import os
+from contextlib import contextmanager
+from hashlib import blake2b
+
+import numpy as np
+
+from jsonlio import detect_compression, open_jsonl
+from keystore import key_digest
+
+# Per-line status codes
+LINE_INVALID, LINE_NO_KEY, LINE_KEYED = 0, 1, 2
+# Bytes scanned per block; each block is copied out of the input once
+SCAN_BLOCK = 16 << 20
+# Longest run of blanks and colon between a key and its value on the fast path
+MAX_SEPARATOR = 4
+
+
+def composite_digest(values, bits=64):
+    """
+    Digest of a tuple of key values
+
+    Each value is encoded like keystore.key_digest does (UTF-8 for strings,
+    marked canonical JSON otherwise) and length-prefixed, so ("ab", "c")
+    and ("a", "bc") never collide by construction.
+    """
+    h = blake2b(digest_size=bits // 8)
+    for value in values:
+        data = value if type(value) is bytes else _value_bytes(value)
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return int.from_bytes(h.digest(), "little")
+
+
+def _value_bytes(value):
+    if type(value) is str:
+        return value.encode("utf-8", "surrogatepass")
+    return b"\x00" + json.dumps(value, sort_keys=True).encode("utf-8")
+
+
+class KeyScanner:
+    """
+    Pull dedup keys out of JSONL lines without decoding the whole row
+
+    Input is scanned in newline-aligned blocks of SCAN_BLOCK bytes, with
+    no per-line Python work until hashing. Per block, the positions of
+    newlines, quotes, backslashes and "{" come from vectorized byte
+    comparisons; every quoted occurrence of a key field is found among
+    the quotes, and its string value is the span between the next two
+    quotes. The value bytes are hashed as they are; they are exactly the
+    UTF-8 of the decoded string as long as they contain no backslash. A
+    line takes this fast path when its object opens the line and each
+    field occurs once, unescaped, as `"field": "value"` (blanks allowed
+    around the colon), before any nested "{". Escaped strings, non-string
+    values, missing or repeated fields and anything else unusual fall back
+    to json.loads for that line, so digests always agree with
+    keystore.key_digest / composite_digest over the parsed values.
+
+    Lines that take the fast path are not validated beyond the key fields.
+
+    Args:
+        key_fields (str or tuple): One field name, or several for a composite key
+        bits (int): Digest width, 64 or 128
+    """
+
+    def __init__(self, key_fields, bits=64):
+        self.composite = not isinstance(key_fields, str)
+        self.key_fields = tuple(key_fields) if self.composite else (key_fields,)
+        self.bits = bits
+        self.words = bits // 64
+        self.digest_size = bits // 8
+        self._tokens = [json.dumps(field).encode("utf-8") for field in self.key_fields]
+        # Parsed-path fallbacks (the slow lines)
+        self.fallbacks = 0
+
+    def _parse_line(self, line):
+        self.fallbacks += 1
+        try:
+            entry = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return LINE_INVALID, None
+        if not isinstance(entry, dict):
+            return LINE_INVALID, None
+        values = [entry.get(field) for field in self.key_fields]
+        # Like remove_duplicates, a falsy key (or any falsy part of a composite key) is no key
+        if not all(values):
+            return LINE_NO_KEY, None
+        if not self.composite:
+            return LINE_KEYED, key_digest(values[0], self.bits)
+        return LINE_KEYED, composite_digest(values, self.bits)
+
+    def digest_line(self, buf, start, end):
+        """
+        Classify buf[start:end] and digest its key
+
+        Returns:
+            tuple: (status, digest) where status is LINE_INVALID, LINE_NO_KEY
+                or LINE_KEYED and digest is None unless the line is keyed
+        """
+        starts, ends, status, digests = self.scan_block(bytes(buf[start:end]))
+        if not len(status):
+            return LINE_INVALID, None
+        if status[0] != LINE_KEYED:
+            return int(status[0]), None
+        return LINE_KEYED, _digest_int(digests[0])
+
+    def _value_spans(self, token, data, quotes, backslashes, starts, ends, next_brace):
+        """Per line, the value span of the field if it is a fast-path candidate, else (-1, -1)"""
+        spans = np.full((len(starts), 2), -1, dtype=np.int64)
+        # Every occurrence of the quoted field name starts at a quote
+        tokens = quotes[quotes + len(token) <= len(data)]
+        for i in range(1, len(token)):
+            tokens = tokens[data[tokens + i] == token[i]]
+        if not len(tokens):
+            return spans
+        lines = np.searchsorted(starts, tokens, side="right") - 1
+        counts = np.bincount(lines, minlength=len(starts))
+
+        # The value opens at the next quote after the name and closes at the one after that
+        close = tokens + len(token) - 1
+        after = np.searchsorted(quotes, close) + 1
+        padded = np.append(quotes, [len(data), len(data)])
+        value_start = padded[after] + 1
+        value_end = padded[after + 1]
+
+        # Between name and value only blanks and exactly one colon
+        gap = value_start - 1 - (close + 1)
+        ok = (gap >= 1) & (gap <= MAX_SEPARATOR)
+        colons = np.zeros(len(tokens), dtype=np.int64)
+        for i in range(MAX_SEPARATOR):
+            within = i < gap
+            byte = data[np.minimum(close + 1 + i, len(data) - 1)]
+            ok &= ~within | (byte == ord(" ")) | (byte == ord("\t")) | (byte == ord(":"))
+            colons += within & (byte == ord(":"))
+        ok &= colons == 1
+
+        # A backslash in the value means escapes; one before the name means it sits inside another string
+        ok &= backslashes[np.searchsorted(backslashes, np.minimum(value_start, len(data)))] >= value_end
+        ok &= data[np.maximum(tokens - 1, 0)] != ord("\\")
+        ok &= (value_end < ends[lines]) & (counts[lines] == 1) & (tokens < next_brace[lines])
+        spans[lines[ok], 0] = value_start[ok]
+        spans[lines[ok], 1] = value_end[ok]
+        return spans
+
+    def scan_block(self, block):
+        """
+        Classify and digest every line of a bytes block
+
+        Returns:
+            tuple: numpy arrays (starts, ends, status, digests) with one entry
+                per line; offsets are relative to the block, `ends` include
+                the newline, and digests is uint64 of shape (lines, bits // 64),
+                zero unless the line is keyed
+        """
+        data = np.frombuffer(block, dtype=np.uint8)
+        ends = np.flatnonzero(data == ord("\n")) + 1
+        if len(block) and block[-1:] != b"\n":
+            ends = np.append(ends, len(block))
+        starts = np.concatenate(([0], ends[:-1]))
+        status = np.full(len(ends), LINE_INVALID, dtype=np.uint8)
+        digests = np.zeros((len(ends), self.words), dtype=np.uint64)
+        if not len(ends):
+            return starts[:0], ends, status, digests
+
+        # The first "{" after each line's opening byte; the key fields must come before it
+        braces = np.append(np.flatnonzero(data == ord("{")), len(block))
+        next_brace = braces[np.searchsorted(braces, starts + 1)]
+        quotes = np.flatnonzero(data == ord('"'))
+        backslashes = np.append(np.flatnonzero(data == ord("\\")), len(block))
+        fast = data[starts] == ord("{")
+        spans = [
+            self._value_spans(token, data, quotes, backslashes, starts, ends, next_brace)
+            for token in self._tokens
+        ]
+        empty = np.zeros(len(ends), dtype=bool)
+        for field_spans in spans:
+            fast &= field_spans[:, 0] >= 0
+            empty |= field_spans[:, 0] == field_spans[:, 1]
+        status[fast & empty] = LINE_NO_KEY
+
+        keyed = np.flatnonzero(fast & ~empty)
+        status[keyed] = LINE_KEYED
+        if not self.composite:
+            size = self.digest_size
+            value_starts = spans[0][keyed, 0].tolist()
+            value_ends = spans[0][keyed, 1].tolist()
+            data = b"".join([blake2b(block[s:e], digest_size=size).digest() for s, e in zip(value_starts, value_ends)])
+            digests[keyed] = np.frombuffer(data, dtype="<u8").reshape(-1, self.words)
+        else:
+            field_spans = np.stack([field_spans[keyed] for field_spans in spans], axis=1).tolist()
+            for row, line_spans in zip(keyed.tolist(), field_spans):
+                digests[row] = _digest_words(composite_digest([block[s:e] for s, e in line_spans], self.bits), self.words)
+
+        for row in np.flatnonzero(~fast).tolist():
+            line_status, digest = self._parse_line(block[starts[row]:ends[row]])
+            status[row] = line_status
+            if digest is not None:
+                digests[row] = _digest_words(digest, self.words)
+        return starts, ends, status, digests
+
+    def scan_blocks(self, buf, start=0, end=None):
+        """
+        Scan buf[start:end] block by block
+
+        Yields:
+            tuple: (offset, starts, ends, status, digests) per block, as from
+                scan_block(), with offsets relative to `offset` in buf
+        """
+        end = len(buf) if end is None else end
+        while start < end:
+            stop = min(start + SCAN_BLOCK, end)
+            if stop < end:
+                newline = buf.rfind(b"\n", start, stop)
+                if newline == -1:
+                    # A single line longer than the block
+                    newline = buf.find(b"\n", stop, end)
+                stop = end if newline == -1 else newline + 1
+            yield (start,) + self.scan_block(buf[start:stop])
+            start = stop
+
+    def scan(self, buf, start=0, end=None):
+        """Yield (start, end, status, digest) for each line of buf[start:end]; `end` includes the newline"""
+        for offset, *arrays in self.scan_blocks(buf, start, end):
+            yield from _iter_lines(offset, *arrays)
+
+
+def _iter_lines(offset, starts, ends, status, digests):
+    if digests.shape[1] == 1:
+        values = digests[:, 0].tolist()
+    else:
+        values = [low | high << 64 for low, high in digests.tolist()]
+    for start, end, line_status, digest in zip(
+            (starts + offset).tolist(), (ends + offset).tolist(), status.tolist(), values):
+        yield start, end, line_status, digest if line_status == LINE_KEYED else None
+
+
+def _digest_int(words):
+    return sum(int(word) << (64 * i) for i, word in enumerate(words))
+
+
+def _digest_words(digest, words):
+    return [(digest >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(words)]
+
+
+def _read_blocks(f):
+    """Newline-aligned blocks of about SCAN_BLOCK bytes from a binary stream"""
+    tail = b""
+    for chunk in iter(lambda: f.read(SCAN_BLOCK), b""):
+        block = tail + chunk
+        cut = block.rfind(b"\n") + 1
+        if cut:
+            yield block[:cut]
+        tail = block[cut:]
+    if tail:
+        yield tail
+
+
+def scan_lines(scanner, path):
+    """
+    Yield (line bytes, status, digest) for every line of a JSONL file
+
+    Plain files are read and gzip, xz and bz2 files decompressed as a
+    stream, in newline-aligned blocks that go through scanner.scan_block.
+    """
+    with open_jsonl(path, "rb") as f:
+        for block in _read_blocks(f):
+            for start, end, status, digest in _iter_lines(0, *scanner.scan_block(block)):
+                yield block[start:end], status, digest
+
+
+@contextmanager
+def map_file(path):
+    """Read-only memory map of a file (an empty bytes object for an empty file)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import math
+from array import array
+
+import numpy as np
+
+# Grow the table once it is this full; linear probing stays short below ~0.7
+MAX_LOAD = 0.6
+
+
+def key_digest(key, bits=64):
+    """
+    Hash a dedup key to a `bits`-wide integer digest (blake2b)
+
+    Strings are hashed as UTF-8; any other JSON value is hashed through its
+    canonical JSON encoding behind a marker byte, so 1 and "1" stay distinct.
+    """
+    return int.from_bytes(hashlib.blake2b(_key_bytes(key), digest_size=bits // 8).digest(), "little")
+
+
+def key_digests(keys, bits=64):
+    """key_digest of every key as a uint64 array of shape (len(keys), bits // 64), low word first"""
+    size = bits // 8
+    data = b"".join([hashlib.blake2b(_key_bytes(key), digest_size=size).digest() for key in keys])
+    return np.frombuffer(data, dtype="<u8").reshape(-1, bits // 64)
+
+
+def _key_bytes(key):
+    if type(key) is str:
+        return key.encode("utf-8", "surrogatepass")
+    return b"\x00" + json.dumps(key, sort_keys=True).encode("utf-8")
+
+
+def collision_probability(n, bits=64):
+    """Birthday-bound probability that any two of `n` keys share a `bits`-wide digest"""
+    return -math.expm1(-n * (n - 1) / 2 ** (bits + 1))
+
+
+class DigestSet:
+    """
+    Set of fixed-width key digests in an array-backed open-addressing table
+
+    Keys are never stored, only their 64- or 128-bit blake2b digests, packed
+    into one flat array("Q") (two words per slot for 128-bit digests) and
+    probed linearly. That is 8-16 bytes per slot against a few hundred bytes
+    per str in a Python set. Two different keys collide only if their
+    digests do; collision_probability() gives the birthday bound for the
+    current size. add_digests() inserts a whole batch with vectorized
+    probing, which is how large inputs should feed the table.
+
+    Args:
+        bits (int): Digest width, 64 or 128
+        capacity (int): Expected number of keys, to avoid early resizes
+    """
+
+    def __init__(self, bits=64, capacity=1024):
+        if bits not in (64, 128):
+            raise ValueError("bits must be 64 or 128")
+        self.bits = bits
+        self._words = bits // 64
+        self._size = 0
+        slots = 8
+        while slots * MAX_LOAD < capacity:
+            slots *= 2
+        self._allocate(slots)
+
+    def _allocate(self, slots):
+        self._slots = slots
+        self._mask = slots - 1
+        self._limit = int(slots * MAX_LOAD)
+        self._table = array("Q", bytes(8 * self._words * slots))
+
+    def _view(self):
+        # Writable (slots, words) view of the table
+        return np.frombuffer(self._table, dtype=np.uint64).reshape(-1, self._words)
+
+    def _resize(self, slots=None):
+        view = self._view()
+        occupied = view[view.any(axis=1)]
+        self._allocate(slots or self._slots * 2)
+        self._insert_batch(occupied)
+
+    def _split(self, digest):
+        low = digest & 0xFFFFFFFFFFFFFFFF
+        high = digest >> 64
+        # All-zero words mark empty slots, so a zero digest is folded onto 1
+        if not low and not high:
+            low = 1
+        return low, high
+
+    def _insert(self, low, high):
+        """Insert split digest words; return False if they were already present"""
+        table, mask = self._table, self._mask
+        i = low & mask
+        if self._words == 1:
+            while True:
+                current = table[i]
+                if current == 0:
+                    table[i] = low
+                    return True
+                if current == low:
+                    return False
+                i = (i + 1) & mask
+        while True:
+            j = 2 * i
+            current_low, current_high = table[j], table[j + 1]
+            if current_low == 0 and current_high == 0:
+                table[j] = low
+                table[j + 1] = high
+                return True
+            if current_low == low and current_high == high:
+                return False
+            i = (i + 1) & mask
+
+    def add_digest(self, digest):
+        """Add a precomputed digest; return True if it was not present yet"""
+        if self._size >= self._limit:
+            self._resize()
+        low, high = self._split(digest)
+        if self._insert(low, high):
+            self._size += 1
+            return True
+        return False
+
+    def _insert_batch(self, digests):
+        """Insert distinct, nonzero digest rows with vectorized probing; return a mask of the new ones"""
+        view = self._view()
+        new = np.zeros(len(digests), dtype=bool)
+        pending = np.arange(len(digests))
+        slot = (digests[:, 0] & np.uint64(self._mask)).astype(np.intp)
+        while len(pending):
+            current = view[slot]
+            wanted = digests[pending]
+            found = (current == wanted).all(axis=1)
+            empty = np.flatnonzero(~current.any(axis=1))
+            # Several digests may probe the same empty slot in one round: the first claims it
+            claimed = empty[np.unique(slot[empty], return_index=True)[1]]
+            view[slot[claimed]] = wanted[claimed]
+            new[pending[claimed]] = True
+            found[claimed] = True
+            pending = pending[~found]
+            slot = (slot[~found] + 1) & self._mask
+        return new
+
+    def add_digests(self, digests):
+        """
+        Add a batch of digests in one vectorized pass
+
+        Args:
+            digests (numpy.ndarray): uint64 digests of shape (n, bits // 64),
+                low word first (1-D is fine for 64-bit), e.g. from key_digests()
+
+        Returns:
+            numpy.ndarray: bool per row, True where the digest was neither in
+                the set nor earlier in the batch
+        """
+        digests = np.array(digests, dtype=np.uint64).reshape(-1, self._words)
+        new = np.zeros(len(digests), dtype=bool)
+        if not len(digests):
+            return new
+        # Same zero folding as _split
+        digests[~digests.any(axis=1), 0] = 1
+        keys = digests[:, 0] if self._words == 1 else digests.view(np.dtype((np.void, 16)))[:, 0]
+        first = np.unique(keys, return_index=True)[1]
+
+        slots = self._slots
+        while slots * MAX_LOAD < self._size + len(first):
+            slots *= 2
+        if slots != self._slots:
+            self._resize(slots)
+
+        inserted = self._insert_batch(digests[first])
+        new[first[inserted]] = True
+        self._size += int(inserted.sum())
+        return new
+
+    def add(self, key):
+        """Add a key; return True if it was not present yet"""
+        return self.add_digest(key_digest(key, self.bits))
+
+    def contains_digest(self, digest):
+        low, high = self._split(digest)
+        table, mask, words = self._table, self._mask, self._words
+        i = low & mask
+        while True:
+            j = words * i
+            current_low = table[j]
+            current_high = table[j + 1] if words == 2 else 0
+            if current_low == 0 and current_high == 0:
+                return False
+            if current_low == low and current_high == high:
+                return True
+            i = (i + 1) & mask
+
+    def __contains__(self, key):
+        return self.contains_digest(key_digest(key, self.bits))
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        """Memory held by the table itself"""
+        return self._table.itemsize * len(self._table)
+
+    def collision_probability(self, n=None):
+        """Birthday-bound probability that any two of `n` keys (default: len) share a digest"""
+        return collision_probability(self._size if n is None else n, self.bits)
@@ -0,0 +1,281 @@
+"""
+Byte-offset line index for random access into JSONL files
+
+The sidecar `<file>.idx` starts with a fixed header and is followed by one
+little-endian uint64 per line, the byte offset where that line starts:
+
+    magic     8 bytes  b"JSONLIDX"
+    covered   uint64   size of the data file the index covers
+    lines     uint64   number of offsets that follow
+    tail_crc  uint64   CRC32 of the last (up to) 4 KiB before `covered`
+
+A file that grew past `covered` with an unchanged tail was appended to, so
+only the new bytes are scanned and their offsets appended to the sidecar.
+Anything else (shrunk, rewritten) triggers a full rebuild. Offsets are found
+by vectorized newline search over 16 MiB blocks; reads go through a
+read-only memory map of the data file and of the offsets, so row N costs
+two array lookups and one slice, whatever N is.
+
+Usage:
+    python lineindex.py build train/main.jsonl
+    python lineindex.py get train/main.jsonl 1234 1240
+    python lineindex.py sample train/main.jsonl train2percent.jsonl --fraction 0.02 --seed 7
+"""
+import argparse
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from jsonlio import detect_compression
+from serializer import get_loads
+
+MAGIC = b"JSONLIDX"
+_HEADER = struct.Struct("<8sQQQ")
+HEADER_SIZE = _HEADER.size
+# Bytes before the covered end that must be unchanged for an incremental update
+TAIL_BYTES = 4096
+SCAN_BLOCK = 16 << 20
+
+
+def index_path_for(path):
+    return path + ".idx"
+
+
+def _tail_crc(f, covered):
+    start = max(0, covered - TAIL_BYTES)
+    f.seek(start)
+    return zlib.crc32(f.read(covered - start))
+
+
+def _read_header(index_path):
+    """(covered, lines, tail_crc) of an existing index, or None if missing or not an index"""
+    try:
+        with open(index_path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            size = os.fstat(f.fileno()).st_size
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER_SIZE:
+        return None
+    magic, covered, lines, tail_crc = _HEADER.unpack(header)
+    if magic != MAGIC or size < HEADER_SIZE + 8 * lines:
+        return None
+    return covered, lines, tail_crc
+
+
+def _scan_offsets(f, start, end):
+    """Start offsets of the lines beginning in [start, end), given that a line starts at `start`"""
+    blocks = [np.array([start], dtype=np.uint64)] if start < end else []
+    f.seek(start)
+    position = start
+    while position < end:
+        block = f.read(min(SCAN_BLOCK, end - position))
+        if not block:
+            break
+        newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10).astype(np.uint64)
+        starts = newlines + np.uint64(position + 1)
+        blocks.append(starts[starts < end])
+        position += len(block)
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=np.uint64)
+
+
+def update_index(path, index_path=None):
+    """
+    Bring the sidecar index of `path` up to date, extending it in place when possible
+
+    Returns:
+        tuple: (lines in the index, lines added by this call)
+    """
+    if detect_compression(path):
+        raise ValueError(f"{path} is compressed; line offsets need an uncompressed file")
+    index_path = index_path or index_path_for(path)
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        header = _read_header(index_path)
+        incremental = header is not None and header[0] <= size and _tail_crc(f, header[0]) == header[2]
+        keep, start = 0, 0
+        if incremental:
+            covered, lines, _ = header
+            if covered == size:
+                return lines, 0
+            keep, start = lines, covered
+            if lines:
+                f.seek(covered - 1)
+                if f.read(1) != b"\n":
+                    # The last indexed line had no newline yet and may have grown: rescan it
+                    keep -= 1
+                    with open(index_path, "rb") as idx:
+                        idx.seek(HEADER_SIZE + 8 * keep)
+                        start = int.from_bytes(idx.read(8), "little")
+
+        offsets = _scan_offsets(f, start, size)
+        tail_crc = _tail_crc(f, size)
+
+    target = index_path if incremental else index_path + ".tmp"
+    with open(target, "r+b" if incremental else "wb") as idx:
+        # Offsets before the header: until the header is rewritten it still describes valid data
+        idx.seek(HEADER_SIZE + 8 * keep)
+        idx.truncate()
+        idx.write(offsets.astype("<u8").tobytes())
+        idx.flush()
+        idx.seek(0)
+        idx.write(_HEADER.pack(MAGIC, size, keep + len(offsets), tail_crc))
+    if not incremental:
+        os.replace(target, index_path)
+
+    total = keep + len(offsets)
+    return total, total - (header[1] if incremental else 0)
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LineIndex:
+    """
+    Random access to the lines of a JSONL file through its sidecar index
+
+    Row numbers are 0-based line numbers, blank lines included. Returned
+    lines have their trailing newline stripped.
+
+    Args:
+        path (str): JSONL file (uncompressed)
+        index_path (str): Sidecar path (default: path + ".idx")
+        update (bool): Build or extend the index when it is missing or stale
+    """
+
+    def __init__(self, path, index_path=None, update=True):
+        self.path = path
+        self.index_path = index_path or index_path_for(path)
+        self._loads = get_loads()
+        self.refresh(update)
+
+    def refresh(self, update=True):
+        """Pick up lines appended since the index was opened; return how many were added"""
+        added = update_index(self.path, self.index_path)[1] if update else 0
+        header = _read_header(self.index_path)
+        if header is None:
+            raise FileNotFoundError(f"No line index at {self.index_path}")
+        self.covered, lines, _ = header
+        if lines:
+            self._offsets = np.memmap(self.index_path, dtype="<u8", mode="r", offset=HEADER_SIZE, shape=(lines,))
+        else:
+            self._offsets = np.empty(0, dtype=np.uint64)
+        self._data = _map(self.path)
+        return added
+
+    def __len__(self):
+        return len(self._offsets)
+
+    @property
+    def offsets(self):
+        """Memory-mapped uint64 start offset of every line"""
+        return self._offsets
+
+    def _span(self, start, stop):
+        begin = int(self._offsets[start])
+        end = int(self._offsets[stop]) if stop < len(self._offsets) else self.covered
+        return begin, end
+
+    def _row_number(self, row):
+        n = len(self._offsets)
+        if row < 0:
+            row += n
+        if not 0 <= row < n:
+            raise IndexError(f"row {row} out of range for {n} lines")
+        return row
+
+    def line(self, row):
+        """Raw bytes of one line"""
+        row = self._row_number(row)
+        begin, end = self._span(row, row + 1)
+        data = self._data[begin:end]
+        return data[:-1] if data.endswith(b"\n") else data
+
+    def raw(self, start, stop):
+        """Lines [start, stop) as one contiguous bytes block, newlines included"""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return b""
+        begin, end = self._span(start, stop)
+        return self._data[begin:end]
+
+    def lines(self, start, stop):
+        """Lines [start, stop) as a list of bytes"""
+        block = self.raw(start, stop)
+        if not block:
+            return []
+        lines = block.split(b"\n")
+        # A block of newline-terminated lines ends in an empty piece after its final newline
+        return lines[:-1] if block.endswith(b"\n") else lines
+
+    def __getitem__(self, row):
+        """Parsed row, or a list of parsed rows for a slice"""
+        if isinstance(row, slice):
+            if row.step not in (None, 1):
+                return self.take(range(*row.indices(len(self))))
+            start, stop, _ = row.indices(len(self))
+            return [self._loads(line) for line in self.lines(start, stop)]
+        return self._loads(self.line(row))
+
+    def take(self, rows):
+        """Parsed rows at arbitrary positions, in the given order"""
+        return [self._loads(self.line(int(row))) for row in rows]
+
+    def write_rows(self, output_file, rows):
+        """Copy the lines at `rows` (ascending for sequential reads) to a new file; return the count"""
+        written = 0
+        with open(output_file, "wb", buffering=1 << 20) as out:
+            for row in rows:
+                out.write(self.line(int(row)))
+                out.write(b"\n")
+                written += 1
+        return written
+
+    def sample(self, fraction, seed=None):
+        """Sorted row numbers of a uniform random subset of round(fraction * len(self)) rows"""
+        rng = np.random.default_rng(seed)
+        count = int(round(fraction * len(self)))
+        return np.sort(rng.choice(len(self), size=count, replace=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Byte-offset line index for JSONL files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Create or extend the .idx sidecar")
+    build.add_argument("files", nargs="+")
+    get = subparsers.add_parser("get", help="Print rows [start, stop)")
+    get.add_argument("file")
+    get.add_argument("start", type=int)
+    get.add_argument("stop", type=int, nargs="?")
+    sample = subparsers.add_parser("sample", help="Write a random subset of rows")
+    sample.add_argument("file")
+    sample.add_argument("output_file")
+    sample.add_argument("--fraction", type=float, required=True)
+    sample.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        for path in args.files:
+            lines, added = update_index(path)
+            print(f"{path}: {lines} lines indexed ({added} new)")
+    elif args.command == "get":
+        index = LineIndex(args.file)
+        stop = args.start + 1 if args.stop is None else args.stop
+        for line in index.lines(args.start, stop):
+            print(line.decode("utf-8", errors="replace"))
+    else:
+        index = LineIndex(args.file)
+        written = index.write_rows(args.output_file, index.sample(args.fraction, args.seed))
+        print(f"Wrote {written} of {len(index)} rows to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
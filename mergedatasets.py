@@ -0,0 +1,97 @@
+"""
+Merge any number of JSONL datasets into one, deduplicated across all inputs
+
+Sources are streamed one line at a time (plain files from a read-only memory
+map, gzip/xz/bz2 files decompressed on the fly), highest priority first
+(ties keep command-line order), and a row is kept only if its key has not
+been emitted by any earlier source. Only key digests are
+held in memory (keystore.DigestSet), so memory grows with the number of
+unique keys at 8-16 bytes each and never with the size of the inputs.
+
+Usage:
+    python mergedatasets.py merged.jsonl train/main.jsonl:10 train6.jsonl:5 train1.jsonl train2percent.jsonl
+    python mergedatasets.py merged.jsonl train*.jsonl --key-field instruction response --report merge.json
+"""
+import argparse
+import json
+
+from jsonlio import open_jsonl
+from keyscan import LINE_INVALID, LINE_KEYED, KeyScanner, scan_lines
+from keystore import DigestSet
+
+
+def parse_source(spec):
+    """Split "path[:priority]" into (path, priority); priority defaults to 0"""
+    path, sep, priority = spec.rpartition(":")
+    if sep and path and priority.lstrip("-").isdigit():
+        return path, int(priority)
+    return spec, 0
+
+
+def merge_datasets(sources, output_file, key_field="instruction", digest_bits=64):
+    """
+    Stream-merge JSONL files, keeping the first row of every key
+
+    Args:
+        sources (list): (path, priority) pairs; higher priority sources win duplicates
+        output_file (str): Path for the merged output (.gz/.xz/.bz2 to compress)
+        key_field (str or tuple): Field, or fields for a composite key
+        digest_bits (int): Key digest width, 64 or 128
+
+    Returns:
+        list: One dict per source, in processing order, with rows read,
+            rows kept, duplicates and invalid lines
+    """
+    ordered = sorted(enumerate(sources), key=lambda item: (-item[1][1], item[0]))
+    scanner = KeyScanner(key_field, digest_bits)
+    seen = DigestSet(bits=digest_bits)
+    stats = []
+
+    with open_jsonl(output_file, "wb") as out:
+        for _, (path, priority) in ordered:
+            counts = {"source": path, "priority": priority, "rows": 0, "kept": 0, "duplicates": 0, "invalid": 0}
+            for line, status, digest in scan_lines(scanner, path):
+                if status == LINE_INVALID:
+                    # Blank lines are not rows
+                    if line.strip():
+                        counts["invalid"] += 1
+                    continue
+                counts["rows"] += 1
+                if status == LINE_KEYED and seen.add_digest(digest):
+                    out.write(line)
+                    if not line.endswith(b"\n"):
+                        out.write(b"\n")
+                    counts["kept"] += 1
+                else:
+                    counts["duplicates"] += 1
+            stats.append(counts)
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge and deduplicate JSONL datasets")
+    parser.add_argument("output_file")
+    parser.add_argument("sources", nargs="+", help="Input files as path[:priority] (higher wins duplicates)")
+    parser.add_argument("--key-field", nargs="+", default=["instruction"], help="Field(s) forming the dedup key")
+    parser.add_argument("--digest-bits", type=int, choices=[64, 128], default=64)
+    parser.add_argument("--report", help="Write per-source counts as JSON to this path")
+    args = parser.parse_args(argv)
+
+    key_field = args.key_field[0] if len(args.key_field) == 1 else tuple(args.key_field)
+    stats = merge_datasets([parse_source(spec) for spec in args.sources], args.output_file, key_field, args.digest_bits)
+
+    for counts in stats:
+        print(
+            f"{counts['source']:>32} (priority {counts['priority']:>3})  "
+            f"{counts['kept']:>8} kept  {counts['duplicates']:>8} duplicates  {counts['invalid']:>5} invalid"
+        )
+    print(f"Merged {sum(c['kept'] for c in stats)} unique rows from {sum(c['rows'] for c in stats)} rows into {args.output_file}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(stats, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
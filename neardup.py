@@ -0,0 +1,232 @@
+"""
+Near-duplicate detection for JSONL datasets with MinHash and LSH banding
+
+Rows are shingled into word k-grams over the chosen fields, each row gets a
+MinHash signature, and signatures are split into bands that are hashed into
+buckets. Rows sharing a bucket in any band are candidates; a candidate is a
+near-duplicate when the fraction of agreeing signature values (the Jaccard
+estimate) reaches the threshold. Each row is only checked against one
+representative per band, so a pass is linear in the number of rows.
+
+Usage:
+    python neardup.py report train.jsonl --threshold 0.8
+    python neardup.py drop train.jsonl train_neardedup.jsonl --threshold 0.8
+"""
+import argparse
+import json
+import re
+import zlib
+
+import numpy as np
+
+from jsonlio import open_jsonl
+
+# Mersenne prime for the (a * h + b) mod p permutations; a * h fits in 63 bits for 32-bit h
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+DEFAULT_FIELDS = ("instruction", "response")
+
+
+def shingle_hashes(text, shingle_size=3):
+    """32-bit hashes of the lowercase word k-grams of `text`"""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(words) <= shingle_size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in set(grams)), dtype=np.uint64)
+
+
+def optimal_bands(threshold, num_perm):
+    """
+    Pick (bands, rows per band) for a Jaccard threshold
+
+    Rows sharing a band collide with probability 1 - (1 - s^r)^b, an S-curve
+    whose steepest point sits near (1/b)^(1/r); choose the split that puts it
+    closest to the threshold.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """
+    Streaming MinHash/LSH index
+
+    Args:
+        threshold (float): Estimated Jaccard similarity at which rows count as near-duplicates
+        num_perm (int): Signature length; memory is 4 * num_perm bytes per indexed row
+        shingle_size (int): Words per shingle
+        seed (int): Seed for the hash permutations
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, shingle_size=3, seed=1):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows_per_band = optimal_bands(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        # Band key -> id of the first indexed row with that key, one table per band
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._size = 0
+
+    def signature(self, text):
+        """MinHash signature of `text`, or None if it has no words"""
+        hashes = shingle_hashes(text, self.shingle_size)
+        if not len(hashes):
+            return None
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        r = self.rows_per_band
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def query(self, signature):
+        """Ids of indexed rows that are near-duplicates of `signature`"""
+        matches = []
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            candidate = band.get(key)
+            if candidate is not None and candidate not in matches:
+                if np.count_nonzero(self._signatures[candidate] == signature) >= self.threshold * self.num_perm:
+                    matches.append(candidate)
+        return matches
+
+    def add(self, signature):
+        """Index a signature and return its row id"""
+        if self._size == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        row_id = self._size
+        self._signatures[row_id] = signature
+        self._size += 1
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(key, row_id)
+        return row_id
+
+    def __len__(self):
+        return self._size
+
+
+def _row_text(entry, fields):
+    return " ".join(str(entry.get(field) or "") for field in fields)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_near_duplicates(input_file, fields=DEFAULT_FIELDS, threshold=0.8, num_perm=128, shingle_size=3):
+    """
+    Group the rows of a JSONL file into near-duplicate clusters
+
+    Returns:
+        list: Clusters of 0-based line numbers (only clusters with more than one row),
+            each in file order, largest clusters first
+    """
+    index = NearDuplicateIndex(threshold, num_perm, shingle_size)
+    line_of = []
+    parent = []
+
+    with open_jsonl(input_file, "rt") as infile:
+        for lineno, line in enumerate(infile):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                entry = None
+            if not isinstance(entry, dict):
+                print(f"Skipping invalid JSON line: {line.strip()}")
+                continue
+            signature = index.signature(_row_text(entry, fields))
+            if signature is None:
+                continue
+            matches = index.query(signature)
+            row_id = index.add(signature)
+            line_of.append(lineno)
+            parent.append(row_id)
+            for match in matches:
+                parent[_find(parent, row_id)] = _find(parent, match)
+
+    clusters = {}
+    for row_id, lineno in enumerate(line_of):
+        clusters.setdefault(_find(parent, row_id), []).append(lineno)
+    return sorted((c for c in clusters.values() if len(c) > 1), key=len, reverse=True)
+
+
+def drop_near_duplicates(input_file, output_file, fields=DEFAULT_FIELDS, threshold=0.8, num_perm=128, shingle_size=3):
+    """
+    Copy a JSONL file, keeping only the first row of each near-duplicate cluster
+
+    Returns:
+        tuple: (rows kept, rows dropped)
+    """
+    index = NearDuplicateIndex(threshold, num_perm, shingle_size)
+    kept = dropped = 0
+
+    with open_jsonl(input_file, "rt") as infile, open_jsonl(output_file, "wt") as outfile:
+        for line in infile:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                entry = None
+            if not isinstance(entry, dict):
+                print(f"Skipping invalid JSON line: {line.strip()}")
+                continue
+            signature = index.signature(_row_text(entry, fields))
+            if signature is not None:
+                if index.query(signature):
+                    dropped += 1
+                    continue
+                # Only kept rows are indexed, so every drop is relative to a row in the output
+                index.add(signature)
+            outfile.write(line)
+            kept += 1
+
+    return kept, dropped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find or drop near-duplicate rows in a JSONL file")
+    parser.add_argument("mode", choices=["report", "drop"])
+    parser.add_argument("input_file")
+    parser.add_argument("output_file", nargs="?", help="Output path (drop mode) or JSON cluster report (report mode)")
+    parser.add_argument("--fields", nargs="+", default=list(DEFAULT_FIELDS))
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--shingle-size", type=int, default=3)
+    args = parser.parse_args(argv)
+    options = dict(fields=args.fields, threshold=args.threshold, num_perm=args.num_perm, shingle_size=args.shingle_size)
+
+    if args.mode == "drop":
+        if not args.output_file:
+            parser.error("drop mode needs an output file")
+        kept, dropped = drop_near_duplicates(args.input_file, args.output_file, **options)
+        print(f"Kept {kept} rows, dropped {dropped} near-duplicates.")
+        return
+
+    clusters = find_near_duplicates(args.input_file, **options)
+    print(f"Found {len(clusters)} near-duplicate clusters covering {sum(map(len, clusters))} rows.")
+    for cluster in clusters[:10]:
+        print(f"  {len(cluster)} rows, e.g. lines {cluster[:5]}")
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            json.dump(clusters, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
-import json
 import random
 from faker import Faker
+from textpool import TextPool
+from serializer import JsonlWriter, RowEncoder
 
-fake = Faker()
+# Pre-generated filler text; set USE_TEXT_POOL = False to call Faker on every row
+USE_TEXT_POOL = True
+fake = TextPool() if USE_TEXT_POOL else Faker()
 
 # Competition-Critical Categories
 DOMAINS = [
@@ -82,37 +85,41 @@ def generate_adversarial_question():
         )
     }
 
+GENERATORS = [
+    (generate_trap_question, 0.4),
+    (generate_multi_hop_question, 0.3),
+    (generate_core_question, 0.2),
+    (generate_adversarial_question, 0.1)
+]
+
+# One row from a weighted random generator
+def generate_entry():
+    func = random.choices(
+        [g[0] for g in GENERATORS],
+        weights=[g[1] for g in GENERATORS]
+    )[0]
+    return func()
+
 # Generate Competition Dataset
 def generate_dataset(num_samples=100):
-    generators = [
-        (generate_trap_question, 0.4),
-        (generate_multi_hop_question, 0.3),
-        (generate_core_question, 0.2),
-        (generate_adversarial_question, 0.1)
-    ]
-    
-    with open("train.jsonl", "w") as f:
+    # Flat rows: the key skeleton is pre-encoded once, values are spliced in per row
+    encode_row = RowEncoder(["instruction", "response"])
+    with JsonlWriter("train.jsonl", encode_row) as f:
         for _ in range(num_samples):
-            # Weighted random selection
-            func = random.choices(
-                [g[0] for g in generators],
-                weights=[g[1] for g in generators]
-            )[0]
-            
-            entry = func()
-            f.write(json.dumps(entry) + "\n")
+            f.write(generate_entry())
 
 # Validate against competition requirements
 def validate_entry(entry):
     required_keys = ["instruction", "response"]
     return all(key in entry for key in required_keys)
 
-# Generate 100 samples (competition minimum: 50)
-generate_dataset(100)
+if __name__ == "__main__":
+    # Generate 100 samples (competition minimum: 50)
+    generate_dataset(100)
 
-print("Competition-ready dataset generated:")
-print("- 40% Trap Questions")
-print("- 30% Multi-Hop Reasoning")  
-print("- 20% Core Concepts")
-print("- 10% Adversarial Edge Cases")
-print("Upload to S3 as train.jsonl")
\ No newline at end of file
+    print("Competition-ready dataset generated:")
+    print("- 40% Trap Questions")
+    print("- 30% Multi-Hop Reasoning")  
+    print("- 20% Core Concepts")
+    print("- 10% Adversarial Edge Cases")
+    print("Upload to S3 as train.jsonl")
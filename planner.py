@@ -0,0 +1,93 @@
+from collections import namedtuple
+
+import numpy as np
+
+# A categorical attribute: codes index into `choices`, drawn with optional weights
+Categorical = namedtuple("Categorical", ["name", "choices", "weights"], defaults=(None,))
+
+# An inclusive integer range, equivalent to random.randint(low, high)
+IntRange = namedtuple("IntRange", ["name", "low", "high"])
+
+
+def _object_array(values):
+    # Filled element-wise so tuple-valued choices are not broadcast into extra dimensions
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+class BatchPlanner:
+    """
+    Draw all per-row categorical and numeric attributes for a block of rows
+    in one vectorized NumPy pass
+
+    Each call to plan() returns a structured array with one field per
+    attribute. Categorical fields hold integer codes; decode() turns a
+    planned block back into the configured Python values column by column,
+    so per-row generators only have to render text.
+
+    Args:
+        fields (list): Categorical and IntRange specs, in output order
+        seed (int): Seed for the planner's own Generator (default: fresh entropy)
+    """
+
+    def __init__(self, fields, seed=None):
+        self.fields = tuple(fields)
+        self.rng = np.random.default_rng(seed)
+        self._probs = {}
+        dtype = []
+
+        for field in self.fields:
+            if isinstance(field, Categorical):
+                size = len(field.choices)
+                if size == 0:
+                    raise ValueError(f"Categorical field '{field.name}' has no choices")
+                if field.weights is not None:
+                    if len(field.weights) != size:
+                        raise ValueError(f"Field '{field.name}' has {size} choices but {len(field.weights)} weights")
+                    probs = np.asarray(field.weights, dtype=np.float64)
+                    self._probs[field.name] = probs / probs.sum()
+                dtype.append((field.name, np.min_scalar_type(size - 1)))
+            elif isinstance(field, IntRange):
+                if field.high < field.low:
+                    raise ValueError(f"Field '{field.name}' has an empty range")
+                dtype.append((field.name, np.promote_types(
+                    np.min_scalar_type(field.low), np.min_scalar_type(field.high)
+                )))
+            else:
+                raise TypeError(f"Unsupported plan field: {field!r}")
+
+        self.dtype = np.dtype(dtype)
+        # Decoding tables: object arrays of choices for categoricals, None for raw integers
+        self._decoders = tuple(
+            _object_array(field.choices) if isinstance(field, Categorical) else None
+            for field in self.fields
+        )
+
+    def plan(self, n):
+        """Return a structured array with the attributes of the next `n` rows"""
+        block = np.empty(n, dtype=self.dtype)
+        for field in self.fields:
+            if isinstance(field, Categorical):
+                block[field.name] = self.rng.choice(
+                    len(field.choices), size=n, p=self._probs.get(field.name)
+                )
+            else:
+                block[field.name] = self.rng.integers(field.low, field.high, size=n, endpoint=True)
+        return block
+
+    def decode(self, block):
+        """Map a planned block back to Python values, one list per field"""
+        return [
+            (block[field.name] if choices is None else choices[block[field.name]]).tolist()
+            for field, choices in zip(self.fields, self._decoders)
+        ]
+
+    def iter_rows(self, num_rows, block_size=65536):
+        """Yield decoded attribute tuples for `num_rows` rows, planned block by block"""
+        remaining = num_rows
+        while remaining > 0:
+            n = min(block_size, remaining)
+            yield from zip(*self.decode(self.plan(n)))
+            remaining -= n
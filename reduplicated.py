@@ -1,6 +1,31 @@
+import hashlib
+import heapq
 import json
+import math
+import os
+import tempfile
+from array import array
+from multiprocessing import Pool
 
-def remove_duplicates(input_file, output_file, key_field="instruction"):
+import numpy as np
+
+from jsonlio import detect_compression, open_jsonl
+from keyscan import LINE_INVALID, LINE_KEYED, LINE_NO_KEY, KeyScanner, map_file
+from keystore import DigestSet, key_digests
+
+# Memory allowed for the key set of one bucket in remove_duplicates_external
+DEFAULT_MEMORY_BUDGET = 256 << 20
+# Python str + set entry overhead relative to the raw key bytes
+KEY_MEMORY_FACTOR = 2
+MAX_BUCKETS = 512
+# Buckets still over budget are split again, at most this many times
+MAX_PARTITION_DEPTH = 4
+# Byte range handed to one worker by remove_duplicates_parallel
+DEFAULT_CHUNK_BYTES = 32 << 20
+# Rows whose key digests remove_duplicates inserts into its DigestSet at once
+DIGEST_BATCH = 65536
+
+def remove_duplicates(input_file, output_file, key_field="instruction", digest_bits=None):
     """
     Remove duplicate entries from a JSONL file based on specified key field
     
@@ -8,18 +33,43 @@ def remove_duplicates(input_file, output_file, key_field="instruction"):
         input_file (str): Path to input JSONL file
         output_file (str): Path for deduplicated output file
         key_field (str): Field to use for duplicate detection (default: "instruction")
+        digest_bits (int): None (default) keeps the full keys in a set, which is exact;
+            64 or 128 keeps only blake2b digests of the keys in a keystore.DigestSet,
+            fed DIGEST_BATCH rows at a time, for runs where the keys themselves
+            would not fit in memory (a collision drops a unique row, see the
+            printed probability)
     """
     
-    seen = set()
+    seen = set() if digest_bits is None else DigestSet(bits=digest_bits)
     duplicates_removed = 0
+    # Rows waiting for their digests to be checked as one batch
+    pending_lines = []
+    pending_keys = []
+
+    def flush_pending(outfile):
+        nonlocal duplicates_removed
+        new = seen.add_digests(key_digests(pending_keys, digest_bits))
+        for line, is_new in zip(pending_lines, new.tolist()):
+            if is_new:
+                outfile.write(line)
+        duplicates_removed += len(pending_lines) - int(new.sum())
+        pending_lines.clear()
+        pending_keys.clear()
 
-    with open(input_file, "r") as infile, open(output_file, "w") as outfile:
+    with open_jsonl(input_file, "rt") as infile, open_jsonl(output_file, "wt") as outfile:
         for line in infile:
             try:
                 entry = json.loads(line)
                 key_value = entry.get(key_field)
                 
-                if key_value and key_value not in seen:
+                if not key_value:
+                    duplicates_removed += 1
+                elif digest_bits is not None:
+                    pending_lines.append(line)
+                    pending_keys.append(key_value)
+                    if len(pending_lines) >= DIGEST_BATCH:
+                        flush_pending(outfile)
+                elif key_value not in seen:
                     seen.add(key_value)
                     outfile.write(line)
                 else:
@@ -27,13 +77,303 @@ def remove_duplicates(input_file, output_file, key_field="instruction"):
                     
             except json.JSONDecodeError:
                 print(f"Skipping invalid JSON line: {line.strip()}")
+        if pending_lines:
+            flush_pending(outfile)
+
+    print(f"Finished processing. Removed {duplicates_removed} duplicates.")
+    print(f"Unique entries remaining: {len(seen)}")
+    if digest_bits is not None:
+        print(f"Digest collision probability: {seen.collision_probability():.2e}")
+
+def _bucket_of(key_json, level, num_buckets):
+    # A fresh salt per level, so a re-split spreads keys a coarser level grouped together
+    digest = hashlib.blake2b(key_json.encode("utf-8"), digest_size=8, salt=level.to_bytes(8, "little")).digest()
+    return int.from_bytes(digest, "little") % num_buckets
+
+def _num_buckets(data_bytes, memory_budget):
+    return min(MAX_BUCKETS, max(1, math.ceil(data_bytes * KEY_MEMORY_FACTOR / memory_budget)))
+
+def _partition(records, num_buckets, level, tmp_dir):
+    """Spread (line number, key JSON) records over bucket files; return their paths"""
+    paths = [os.path.join(tmp_dir, f"bucket-{level}-{i}") for i in range(num_buckets)]
+    files = [open(path, "w", encoding="utf-8") for path in paths]
+    try:
+        for lineno, key_json in records:
+            files[_bucket_of(key_json, level, num_buckets)].write(f"{lineno}\t{key_json}\n")
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+def _read_bucket(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for record in f:
+            lineno, key_json = record.rstrip("\n").split("\t", 1)
+            yield int(lineno), key_json
+
+def _dedup_bucket(path, level, memory_budget, tmp_dir):
+    """
+    Keep the first record of every key in one bucket file
+
+    Returns the paths of files holding the surviving line numbers in ascending
+    order. A bucket whose keys would not fit the budget is split again.
+    """
+    size = os.path.getsize(path)
+    if size * KEY_MEMORY_FACTOR > memory_budget and level < MAX_PARTITION_DEPTH:
+        sub_dir = tempfile.mkdtemp(dir=tmp_dir)
+        buckets = _partition(_read_bucket(path), max(2, _num_buckets(size, memory_budget)), level + 1, sub_dir)
+        os.remove(path)
+        survivors = []
+        for bucket in buckets:
+            survivors.extend(_dedup_bucket(bucket, level + 1, memory_budget, sub_dir))
+        # Collapse the sub-buckets into one sorted file so the final merge keeps few files open
+        return [_merge_survivors(survivors, path + ".kept")]
+
+    seen = set()
+    kept = array("Q")
+    for lineno, key_json in _read_bucket(path):
+        if key_json not in seen:
+            seen.add(key_json)
+            kept.append(lineno)
+    os.remove(path)
+    survivor_path = path + ".kept"
+    with open(survivor_path, "wb") as f:
+        kept.tofile(f)
+    return [survivor_path]
+
+def _merge_survivors(paths, output_path):
+    with open(output_path, "wb") as f:
+        block = array("Q")
+        for lineno in heapq.merge(*(_iter_survivors(path) for path in paths)):
+            block.append(lineno)
+            if len(block) >= 65536:
+                block.tofile(f)
+                block = array("Q")
+        block.tofile(f)
+    for path in paths:
+        os.remove(path)
+    return output_path
+
+def _iter_survivors(path, chunk=65536):
+    with open(path, "rb") as f:
+        while True:
+            block = array("Q")
+            block.frombytes(f.read(chunk * block.itemsize))
+            if not block:
+                return
+            yield from block
+
+def remove_duplicates_external(input_file, output_file, key_field="instruction",
+                               memory_budget=DEFAULT_MEMORY_BUDGET, tmp_dir=None):
+    """
+    Remove duplicate entries from a JSONL file too large to dedup in memory
+
+    The first pass hash-partitions (line number, key) records into temporary
+    bucket files, so equal keys always share a bucket. Each bucket is then
+    deduped on its own with an exact set sized to `memory_budget`, and the
+    surviving line numbers of all buckets are merged back in file order
+    while streaming the input a second time. Output is identical to
+    remove_duplicates(..., digest_bits=None).
+
+    Args:
+        input_file (str): Path to input JSONL file
+        output_file (str): Path for deduplicated output file
+        key_field (str): Field to use for duplicate detection (default: "instruction")
+        memory_budget (int): Bytes allowed for the key set of one bucket
+        tmp_dir (str): Directory for bucket files (default: system temp dir)
+    """
+    total = 0
+    unique = 0
+
+    def keyed_records(infile):
+        nonlocal total
+        for lineno, line in enumerate(infile):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping invalid JSON line: {line.strip()}")
+                continue
+            total += 1
+            key_value = entry.get(key_field)
+            # Falsy keys are dropped as duplicates, like remove_duplicates does
+            if key_value:
+                yield lineno, json.dumps(key_value, sort_keys=True)
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as work_dir:
+        # Compressed inputs are sized by their compressed length; buckets over budget split again anyway
+        num_buckets = _num_buckets(os.path.getsize(input_file), memory_budget)
+        with open_jsonl(input_file, "rt") as infile:
+            buckets = _partition(keyed_records(infile), num_buckets, 0, work_dir)
+
+        survivor_files = []
+        for bucket in buckets:
+            survivor_files.extend(_dedup_bucket(bucket, 0, memory_budget, work_dir))
+
+        survivors = heapq.merge(*(_iter_survivors(path) for path in survivor_files))
+        next_kept = next(survivors, None)
+        with open_jsonl(input_file, "rt") as infile, open_jsonl(output_file, "wt") as outfile:
+            for lineno, line in enumerate(infile):
+                if lineno == next_kept:
+                    outfile.write(line)
+                    unique += 1
+                    next_kept = next(survivors, None)
+
+    print(f"Finished processing. Removed {total - unique} duplicates.")
+    print(f"Unique entries remaining: {unique}")
+
+def _require_uncompressed(path):
+    compression = detect_compression(path)
+    if compression is not None:
+        raise ValueError(f"{path} is {compression}-compressed; byte-level modes need a plain file, use remove_duplicates")
+
+def _split_ranges(path, chunk_bytes):
+    """Cut a file into [start, end) byte ranges that begin at line starts"""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _first_occurrences(digests):
+    """Row indices of the first occurrence of each digest (rows of `words` uint64s), in order"""
+    if digests.shape[1] == 1:
+        keys = digests[:, 0]
+    else:
+        keys = np.ascontiguousarray(digests).view(np.dtype((np.void, 8 * digests.shape[1])))[:, 0]
+    first = np.unique(keys, return_index=True)[1]
+    first.sort()
+    return first
+
+def _write_runs(outfile, buf, starts, ends):
+    """Copy the byte spans [starts[i], ends[i]) of buf, merging back-to-back spans into one write"""
+    if not len(starts):
+        return
+    breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+    run_starts = starts[np.concatenate(([0], breaks))]
+    run_ends = ends[np.concatenate((breaks - 1, [len(ends) - 1]))]
+    for run_start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+        outfile.write(buf[run_start:run_end])
+
+def _scan_range(task):
+    """
+    Hash the keys of the lines in one byte range and dedup them locally (runs in a worker)
+
+    Returns numpy arrays instead of rows: the byte spans and digests of the
+    first occurrence of every key in the range, in file order, plus the
+    number of keyed lines, the number of lines without a key and the
+    invalid lines themselves.
+    """
+    path, start, end, key_field, bits = task
+    scanner = KeyScanner(key_field, bits)
+    starts, ends, digests = [], [], []
+    invalid = []
+    no_key = 0
+
+    with map_file(path) as buf:
+        for offset, block_starts, block_ends, status, block_digests in scanner.scan_blocks(buf, start, end):
+            keyed = status == LINE_KEYED
+            starts.append(block_starts[keyed] + offset)
+            ends.append(block_ends[keyed] + offset)
+            digests.append(block_digests[keyed])
+            for i in np.flatnonzero(status == LINE_INVALID).tolist():
+                invalid.append(buf[offset + int(block_starts[i]):offset + int(block_ends[i])])
+            no_key += int(np.count_nonzero(status == LINE_NO_KEY))
+
+    words = bits // 64
+    starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+    ends = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+    digests = np.concatenate(digests) if digests else np.empty((0, words), dtype=np.uint64)
+    first = _first_occurrences(digests)
+    return starts[first], ends[first], digests[first], len(starts), no_key, invalid
+
+def remove_duplicates_mmap(input_file, output_file, key_field="instruction", digest_bits=64):
+    """
+    Remove duplicate entries from a JSONL file without decoding most rows
+
+    The file is memory-mapped and keys are pulled out of it block by block
+    by keyscan.KeyScanner; only lines with escaped or unusual key values are
+    parsed with json.loads. Each block's digests go into a
+    keystore.DigestSet as one batch, and kept lines are copied straight
+    from the mapping.
+
+    Args:
+        input_file (str): Path to input JSONL file
+        output_file (str): Path for deduplicated output file
+        key_field (str or tuple): Field, or fields for a composite key such as
+            ("instruction", "response")
+        digest_bits (int): Key digest width, 64 or 128
+    """
+    _require_uncompressed(input_file)
+    scanner = KeyScanner(key_field, digest_bits)
+    seen = DigestSet(bits=digest_bits)
+    duplicates_removed = 0
+
+    with map_file(input_file) as buf, open(output_file, "wb") as outfile:
+        for offset, starts, ends, status, digests in scanner.scan_blocks(buf):
+            for i in np.flatnonzero(status == LINE_INVALID).tolist():
+                line = buf[offset + int(starts[i]):offset + int(ends[i])]
+                print(f"Skipping invalid JSON line: {line.decode('utf-8', 'replace').strip()}")
+            keyed = np.flatnonzero(status == LINE_KEYED)
+            kept = keyed[seen.add_digests(digests[keyed])]
+            duplicates_removed += int(np.count_nonzero(status != LINE_INVALID)) - len(kept)
+            _write_runs(outfile, buf, starts[kept] + offset, ends[kept] + offset)
+
+    print(f"Finished processing. Removed {duplicates_removed} duplicates.")
+    print(f"Unique entries remaining: {len(seen)}")
+    print(f"Digest collision probability: {seen.collision_probability():.2e}")
+    print(f"Lines that needed a full parse: {scanner.fallbacks}")
+
+def remove_duplicates_parallel(input_file, output_file, key_field="instruction", processes=None,
+                               chunk_bytes=DEFAULT_CHUNK_BYTES, digest_bits=64):
+    """
+    Remove duplicate entries from a JSONL file, parsing keys on all cores
+
+    The file is cut into newline-aligned byte ranges. Workers pull out and
+    hash the keys of each range with keyscan.KeyScanner, drop the repeats
+    within their range, and send back numpy arrays of the remaining digests
+    and byte spans. The parent takes the ranges in file order and inserts
+    each range's digests into one keystore.DigestSet as a batch, so the
+    first occurrence of every key is kept, exactly as in remove_duplicates. Kept
+    spans are coalesced into runs and copied straight from the memory-mapped
+    input. The parent's work grows with the number of unique keys, not the
+    number of lines.
+
+    Args:
+        input_file (str): Path to input JSONL file
+        output_file (str): Path for deduplicated output file
+        key_field (str or tuple): Field, or fields for a composite key
+        processes (int): Worker processes (default: os.cpu_count())
+        chunk_bytes (int): Approximate size of the byte range per task
+        digest_bits (int): Key digest width, 64 or 128
+    """
+    _require_uncompressed(input_file)
+    seen = DigestSet(bits=digest_bits)
+    duplicates_removed = 0
+    tasks = [(input_file, start, end, key_field, digest_bits) for start, end in _split_ranges(input_file, chunk_bytes)]
+
+    with Pool(processes) as pool, map_file(input_file) as buf, open(output_file, "wb") as outfile:
+        for starts, ends, digests, keyed, no_key, invalid in pool.imap(_scan_range, tasks):
+            for line in invalid:
+                print(f"Skipping invalid JSON line: {line.decode('utf-8', 'replace').strip()}")
+            keep = seen.add_digests(digests)
+            duplicates_removed += keyed - int(keep.sum()) + no_key
+
+            _write_runs(outfile, buf, starts[keep], ends[keep])
 
     print(f"Finished processing. Removed {duplicates_removed} duplicates.")
     print(f"Unique entries remaining: {len(seen)}")
+    print(f"Digest collision probability: {seen.collision_probability():.2e}")
 
-# Usage - replace with your actual file paths
-remove_duplicates(
-    input_file="main.jsonl",
-    output_file="mainV2.jsonl",
-    key_field="instruction"  # Change to "output" if needed
-)
\ No newline at end of file
+if __name__ == "__main__":
+    # Usage - replace with your actual file paths
+    remove_duplicates(
+        input_file="main.jsonl",
+        output_file="mainV2.jsonl",
+        key_field="instruction"  # Change to "output" if needed
+    )
@@ -0,0 +1,156 @@
+"""
+Persistent on-disk index of row-key digests, shared across generation runs
+
+The index is a sorted array of 64-bit key digests saved as .npy and opened
+memory-mapped, plus an append-only log of digests added since the last
+compaction. Lookups are an interpolation probe into the sorted array
+(digests are uniform, so the first guess lands within a few pages) and a
+set lookup for the log; nothing is loaded up front.
+
+Usage:
+    python seenindex.py build seen.npy train4.jsonl train5.jsonl train6.jsonl train609.jsonl train/main.jsonl
+    python seenindex.py compact seen.npy
+    python seenindex.py stats seen.npy
+"""
+import argparse
+import math
+import os
+from array import array
+
+import numpy as np
+
+from keyscan import LINE_KEYED, KeyScanner, scan_lines
+from keystore import key_digest
+
+# Fold the log into the sorted array once it holds this many digests
+DEFAULT_COMPACT_THRESHOLD = 1 << 20
+
+
+class SeenIndex:
+    """
+    Sorted memory-mapped digest array with an append log
+
+    Args:
+        path (str): Path of the sorted .npy array; the log is `path + ".log"`
+        compact_threshold (int): Log size that triggers compact() on close (None: never)
+    """
+
+    bits = 64
+
+    def __init__(self, path, compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+        self.path = path
+        self.log_path = path + ".log"
+        self.compact_threshold = compact_threshold
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            self._base = np.load(self.path, mmap_mode="r")
+        else:
+            self._base = np.empty(0, dtype=np.uint64)
+        self._window = 16 + 4 * math.isqrt(len(self._base))
+
+        logged = array("Q")
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                data = f.read()
+            # A torn final record from an interrupted run is ignored
+            logged.frombytes(data[:len(data) - len(data) % logged.itemsize])
+        self._log = set(logged)
+        self._log_file = open(self.log_path, "ab")
+        self._log_file.truncate(len(logged) * logged.itemsize)
+
+    def _in_base(self, digest):
+        base = self._base
+        n = len(base)
+        if not n:
+            return False
+        # Digests are uniform over [0, 2^64), so the expected position is digest / 2^64 * n
+        guess = (digest * n) >> 64
+        lo = max(0, guess - self._window)
+        hi = min(n, guess + self._window)
+        if (lo and base[lo - 1] >= digest) or (hi < n and base[hi] < digest):
+            lo, hi = 0, n
+        window = base[lo:hi]
+        i = int(np.searchsorted(window, np.uint64(digest)))
+        return i < len(window) and int(window[i]) == digest
+
+    def contains_digest(self, digest):
+        return digest in self._log or self._in_base(digest)
+
+    def __contains__(self, key):
+        return self.contains_digest(key_digest(key, self.bits))
+
+    def add_digest(self, digest):
+        """Record a digest; return True if it was not in the index yet"""
+        if self.contains_digest(digest):
+            return False
+        self._log.add(digest)
+        self._log_file.write(digest.to_bytes(8, "little"))
+        return True
+
+    def add(self, key):
+        """Record a key; return True if it was not in the index yet"""
+        return self.add_digest(key_digest(key, self.bits))
+
+    def add_file(self, jsonl_path, key_field="instruction"):
+        """Record the keys of every row of an existing JSONL file; return how many were new"""
+        scanner = KeyScanner(key_field, self.bits)
+        added = 0
+        for _, status, digest in scan_lines(scanner, jsonl_path):
+            if status == LINE_KEYED and self.add_digest(digest):
+                added += 1
+        return added
+
+    def __len__(self):
+        return len(self._base) + len(self._log)
+
+    def flush(self):
+        self._log_file.flush()
+
+    def compact(self):
+        """Merge the log into the sorted array and empty the log"""
+        self._log_file.flush()
+        if not self._log:
+            return
+        logged = np.fromiter(self._log, dtype=np.uint64, count=len(self._log))
+        merged = np.union1d(np.asarray(self._base), logged)
+        tmp_path = self.path + ".tmp.npy"
+        np.save(tmp_path, merged)
+        os.replace(tmp_path, self.path)
+        self._log_file.close()
+        os.remove(self.log_path)
+        self._load()
+
+    def close(self):
+        if self.compact_threshold is not None and len(self._log) >= self.compact_threshold:
+            self.compact()
+        self._log_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and maintain a persistent seen-index")
+    parser.add_argument("command", choices=["build", "compact", "stats"])
+    parser.add_argument("index")
+    parser.add_argument("files", nargs="*", help="JSONL files to add (build)")
+    parser.add_argument("--key-field", default="instruction")
+    args = parser.parse_args(argv)
+
+    with SeenIndex(args.index) as index:
+        if args.command == "build":
+            for path in args.files:
+                print(f"{path}: {index.add_file(path, args.key_field)} new keys")
+            index.compact()
+        elif args.command == "compact":
+            index.compact()
+        print(f"{len(index)} keys ({len(index._base)} compacted, {len(index._log)} in log)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import json
+from json.encoder import encode_basestring_ascii
+
+from jsonlio import CompressedWriter, compression_for_path
+
+try:
+    import orjson
+except ImportError:  # optional fast backend; the stdlib encoder is used instead
+    orjson = None
+
+# Write buffer for JSONL sinks; large enough that syscalls stop showing up in profiles
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def get_dumps(backend="auto"):
+    """
+    Return a function that encodes one entry to JSON bytes
+
+    Args:
+        backend (str): "orjson", "json" or "auto" (orjson when installed)
+    """
+    if backend == "auto":
+        backend = "orjson" if orjson is not None else "json"
+    if backend == "orjson":
+        if orjson is None:
+            raise ImportError("orjson backend requested but orjson is not installed")
+        return orjson.dumps
+    if backend == "json":
+        # Same output as json.dumps, minus the per-call encoder setup and circular checks
+        encode = json.JSONEncoder(check_circular=False).encode
+        return lambda entry: encode(entry).encode("utf-8")
+    raise ValueError(f"Unknown JSON backend: {backend}")
+
+
+def get_loads(backend="auto"):
+    """
+    Return a function that decodes one JSON line (bytes or str)
+
+    Both backends raise a json.JSONDecodeError subclass on bad input.
+
+    Args:
+        backend (str): "orjson", "json" or "auto" (orjson when installed)
+    """
+    if backend == "auto":
+        backend = "orjson" if orjson is not None else "json"
+    if backend == "orjson":
+        if orjson is None:
+            raise ImportError("orjson backend requested but orjson is not installed")
+        return orjson.loads
+    if backend == "json":
+        return json.loads
+    raise ValueError(f"Unknown JSON backend: {backend}")
+
+
+class RowEncoder:
+    """
+    Encoder for flat rows with a fixed key order
+
+    The row skeleton (keys, separators and any constant field values) is
+    encoded to JSON once; each row then only escapes its variable values
+    and splices them between the pre-encoded fragments. Output is
+    byte-identical to json.dumps for the same entry.
+
+    Args:
+        keys (list): Field names in output order
+        constants (dict): Fields whose value is the same on every row
+    """
+
+    def __init__(self, keys, constants=None):
+        constants = constants or {}
+        self.keys = tuple(keys)
+        self._dumps_value = json.JSONEncoder(check_circular=False).encode
+        self._variables = []
+
+        fragment = "{"
+        for i, key in enumerate(self.keys):
+            fragment += ("" if i == 0 else ", ") + encode_basestring_ascii(key) + ": "
+            if key in constants:
+                fragment += json.dumps(constants[key])
+            else:
+                self._variables.append((key, fragment))
+                fragment = ""
+        self._tail = fragment + "}"
+
+    def encode_str(self, entry):
+        """Encode one row to a JSON string"""
+        dumps_value = self._dumps_value
+        parts = []
+        for key, fragment in self._variables:
+            value = entry[key]
+            parts.append(fragment)
+            parts.append(encode_basestring_ascii(value) if type(value) is str else dumps_value(value))
+        parts.append(self._tail)
+        return "".join(parts)
+
+    def __call__(self, entry):
+        return self.encode_str(entry).encode("ascii")
+
+
+class JsonlWriter:
+    """
+    Buffered binary JSONL sink
+
+    Args:
+        path (str): Output file path
+        encoder (callable): entry -> JSON bytes (default: get_dumps())
+        buffer_size (int): Size of the write buffer in bytes
+        append (bool): Append to an existing file instead of truncating it
+        compression (str): "gzip", "xz", "bz2", None, or "auto" to pick from the
+            path suffix (.gz, .xz, .bz2); compression runs on a thread pool
+    """
+
+    def __init__(self, path, encoder=None, buffer_size=DEFAULT_BUFFER_SIZE, append=False, compression="auto"):
+        self.path = path
+        self.encoder = encoder or get_dumps()
+        self.rows = 0
+        self.bytes_written = 0
+        if compression == "auto":
+            compression = compression_for_path(path)
+        if compression is None:
+            self._file = open(path, "ab" if append else "wb", buffering=buffer_size)
+        else:
+            self._file = CompressedWriter(path, compression, append=append)
+
+    def write(self, entry):
+        self.write_encoded(self.encoder(entry))
+
+    def write_encoded(self, line):
+        """Write an already encoded JSON row (without the trailing newline)"""
+        self._file.write(line)
+        self._file.write(b"\n")
+        self.rows += 1
+        self.bytes_written += len(line) + 1
+
+    def write_all(self, entries):
+        for entry in entries:
+            self.write(entry)
+        return self.rows
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+
+from serializer import DEFAULT_BUFFER_SIZE, get_dumps
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ShardFile:
+    """
+    One JSONL shard written under a temporary name and renamed on commit
+
+    Readers never see a partial shard: until commit() the data lives in
+    a hidden ".<name>.tmp" file next to the final path.
+
+    Args:
+        path (str): Final shard path
+        buffer_size (int): Size of the write buffer in bytes
+    """
+
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+        self.rows = 0
+        self.bytes_written = 0
+        self._checksum = hashlib.sha256()
+        self._file = open(self.tmp_path, "wb", buffering=buffer_size)
+
+    def write_encoded(self, line):
+        self._file.write(line)
+        self._file.write(b"\n")
+        self._checksum.update(line)
+        self._checksum.update(b"\n")
+        self.rows += 1
+        self.bytes_written += len(line) + 1
+
+    def write_block(self, block, rows):
+        """Write `rows` already encoded lines, newlines included, in one piece"""
+        self._file.write(block)
+        self._checksum.update(block)
+        self.rows += rows
+        self.bytes_written += len(block)
+
+    def commit(self):
+        """Flush, fsync and rename into place; return the shard's manifest entry"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        return {
+            "path": os.path.basename(self.path),
+            "rows": self.rows,
+            "bytes": self.bytes_written,
+            "sha256": self._checksum.hexdigest()
+        }
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def write_manifest(out_dir, shards, **extra):
+    """Atomically write out_dir/manifest.json for a list of shard entries"""
+    manifest = {
+        "rows": sum(shard["rows"] for shard in shards),
+        "bytes": sum(shard["bytes"] for shard in shards),
+        **extra,
+        "shards": shards
+    }
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def load_manifest(out_dir):
+    with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def verify_manifest(out_dir, checksums=True):
+    """
+    Check every shard listed in the manifest against its size (and checksum)
+
+    Returns:
+        list: Problems found, one message per bad shard (empty if all good)
+    """
+    problems = []
+    for shard in load_manifest(out_dir)["shards"]:
+        path = os.path.join(out_dir, shard["path"])
+        if not os.path.exists(path):
+            problems.append(f"{shard['path']}: missing")
+            continue
+        size = os.path.getsize(path)
+        if size != shard["bytes"]:
+            problems.append(f"{shard['path']}: {size} bytes, manifest says {shard['bytes']}")
+            continue
+        if checksums:
+            checksum = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    checksum.update(block)
+            if checksum.hexdigest() != shard["sha256"]:
+                problems.append(f"{shard['path']}: checksum mismatch")
+    return problems
+
+
+def shard_paths(out_dir):
+    """Paths of the shards listed in a manifest, in order"""
+    return [os.path.join(out_dir, shard["path"]) for shard in load_manifest(out_dir)["shards"]]
+
+
+class ShardedJsonlWriter:
+    """
+    JSONL sink that rolls over to a new shard at a row or byte cap
+
+    Same interface as serializer.JsonlWriter (write, write_encoded,
+    write_all, encoder, rows, bytes_written). Each shard is committed with
+    a temp-then-rename as soon as it is full; closing commits the last one
+    and writes a manifest with per-shard row counts, byte sizes and SHA-256
+    checksums. If the writer exits with an exception the open shard is
+    discarded and no manifest is written.
+
+    Args:
+        out_dir (str): Directory for shards and manifest.json
+        max_rows (int): Rows per shard (None: no row cap)
+        max_bytes (int): Bytes per shard (None: no byte cap); a shard is
+            closed before the row that would push it past the cap
+        prefix (str): Shard file name prefix
+        encoder (callable): entry -> JSON bytes (default: get_dumps())
+        buffer_size (int): Size of the write buffer in bytes
+    """
+
+    def __init__(self, out_dir, max_rows=None, max_bytes=None, prefix="shard", encoder=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        if max_rows is None and max_bytes is None:
+            raise ValueError("Set max_rows and/or max_bytes")
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.encoder = encoder or get_dumps()
+        self.buffer_size = buffer_size
+        self.rows = 0
+        self.bytes_written = 0
+        self.shards = []
+        self.manifest = None
+        self._shard = None
+
+    def _roll(self):
+        if self._shard is not None:
+            self.shards.append(self._shard.commit())
+        path = os.path.join(self.out_dir, f"{self.prefix}-{len(self.shards):05d}.jsonl")
+        self._shard = ShardFile(path, self.buffer_size)
+
+    def write(self, entry):
+        self.write_encoded(self.encoder(entry))
+
+    def write_encoded(self, line):
+        """Write an already encoded JSON row (without the trailing newline)"""
+        shard = self._shard
+        if (shard is None
+                or (self.max_rows is not None and shard.rows >= self.max_rows)
+                or (self.max_bytes is not None and shard.rows and shard.bytes_written + len(line) + 1 > self.max_bytes)):
+            self._roll()
+            shard = self._shard
+        shard.write_encoded(line)
+        self.rows += 1
+        self.bytes_written += len(line) + 1
+
+    def write_all(self, entries):
+        for entry in entries:
+            self.write(entry)
+        return self.rows
+
+    def close(self):
+        if self.manifest is not None:
+            return
+        if self._shard is not None:
+            self.shards.append(self._shard.commit())
+            self._shard = None
+        self.manifest = write_manifest(self.out_dir, self.shards)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._shard is not None:
+            self._shard.discard()
+            self._shard = None
@@ -0,0 +1,368 @@
+"""
+Single-pass stratified train/validation/test splits and percentage subsets
+
+Two ways to assign rows, both deterministic for a given --seed:
+
+    hash       Splits given as fractions ("train=0.8 validation=0.1 test=0.1",
+               "sub=2%"). Each row's key is hashed with the seed to a point in
+               [0, 1) and the row goes to the split whose interval holds it.
+               Rows stream straight to their files, memory is constant, a row
+               keeps its split when the dataset grows, and rows sharing a key
+               never straddle two splits. The key is the whole row by default;
+               --key-field instruction keeps every row of an instruction in one
+               split (no train/test leakage) at the cost of lumpier sizes when
+               instructions repeat. Strata come out
+               proportional in expectation; with the same seed, a 2% subset
+               is contained in the 32% one.
+
+    reservoir  Splits given as row counts ("validation=500 test=500
+               train=rest"). Every stratum keeps the rows with the lowest
+               hash priorities in a bounded heap (as many as all count
+               splits together). At the end each count split, in order, is
+               divided over the strata in proportion to the rows they have
+               left (largest remainder) and gets exactly its count. Rows
+               pushed out of a heap, or left over at the end, go to the
+               "rest" split if there is one (so "rest" is not in input
+               order). Memory is bounded by the reservoir sizes times the
+               number of strata.
+
+Strata: type (metadata.type), category (the part of `context` before " | "),
+difficulty (metadata.difficulty), none, or any dotted field path.
+
+Usage:
+    python splitdataset.py train/main.jsonl splits train=0.8 validation=0.1 test=0.1 --stratify type
+    python splitdataset.py train/main.jsonl subsets train2percent=2% --seed 7
+    python splitdataset.py train/main.jsonl splits validation=500 test=500 train=rest --mode reservoir --stratify category
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import os
+
+from jsonlio import open_jsonl
+from serializer import get_loads
+
+REST = "rest"
+NO_STRATUM = ""
+
+
+def _category(entry):
+    context = entry.get("context")
+    if isinstance(context, str) and context:
+        return context.split(" | ", 1)[0]
+    return NO_STRATUM
+
+
+def _field(path):
+    keys = path.split(".")
+
+    def get(entry):
+        for key in keys:
+            if not isinstance(entry, dict):
+                return NO_STRATUM
+            entry = entry.get(key)
+        return NO_STRATUM if entry is None else entry if isinstance(entry, str) else json.dumps(entry)
+    return get
+
+
+STRATA = {
+    "type": _field("metadata.type"),
+    "category": _category,
+    "difficulty": _field("metadata.difficulty"),
+    "none": lambda entry: NO_STRATUM
+}
+
+
+def stratum_function(stratify):
+    """entry -> stratum label for a named stratification or a dotted field path"""
+    return STRATA.get(stratify) or _field(stratify)
+
+
+def parse_split(spec, mode):
+    """
+    Parse "name=value" into (name, value)
+
+    Hash mode values are fractions ("0.1" or "10%"); reservoir mode values
+    are row counts. "rest" takes whatever the other splits leave.
+    """
+    name, sep, value = spec.partition("=")
+    if not sep or not name:
+        raise ValueError(f"Bad split {spec!r}, expected name=value")
+    if value == REST:
+        return name, REST
+    if mode == "hash":
+        fraction = float(value[:-1]) / 100 if value.endswith("%") else float(value)
+        if not 0 < fraction <= 1:
+            raise ValueError(f"Split {name!r}: fraction must be in (0, 1]")
+        return name, fraction
+    count = int(value)
+    if count < 0:
+        raise ValueError(f"Split {name!r}: count must not be negative")
+    return name, count
+
+
+def _check_splits(splits):
+    names = [name for name, _ in splits]
+    if len(set(names)) != len(names):
+        raise ValueError("Split names must be unique")
+    if sum(value == REST for _, value in splits) > 1:
+        raise ValueError("Only one split can be 'rest'")
+    total = sum(value for _, value in splits if type(value) is float)
+    if total > 1 + 1e-9:
+        raise ValueError(f"Split fractions add up to {total:.4f} > 1")
+
+
+def _unit_point(key, salt):
+    """Salted blake2b of a row key (encoded like keystore.key_digest) mapped to [0, 1)"""
+    if type(key) is bytes:
+        data = key
+    elif type(key) is str:
+        data = key.encode("utf-8", "surrogatepass")
+    else:
+        data = b"\x00" + json.dumps(key, sort_keys=True).encode("utf-8")
+    digest = hashlib.blake2b(data, digest_size=8, key=salt).digest()
+    return int.from_bytes(digest, "little") / 2.0 ** 64
+
+
+def _row_key(line, entry, key_field):
+    if key_field is None:
+        return line.rstrip(b"\r\n")
+    if isinstance(key_field, str):
+        key = entry.get(key_field)
+    else:
+        key = [entry.get(field) for field in key_field]
+    # Rows without the key field fall back to their whole content
+    return entry if key is None else key
+
+
+def _iter_rows(input_file, key_field, stratum_of, salt, counts):
+    loads = get_loads()
+    with open_jsonl(input_file, "rb") as infile:
+        for line in infile:
+            if not line.strip():
+                continue
+            try:
+                entry = loads(line)
+            except json.JSONDecodeError:
+                entry = None
+            if not isinstance(entry, dict):
+                print(f"Skipping invalid JSON line: {line.strip()[:200]!r}")
+                counts["invalid"] += 1
+                continue
+            point = _unit_point(_row_key(line, entry, key_field), salt)
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            yield line, stratum_of(entry), point
+
+
+class _SplitWriters:
+    """One output file per split, with per-stratum row counts"""
+
+    def __init__(self, output_dir, names, suffix):
+        os.makedirs(output_dir, exist_ok=True)
+        self.paths = {name: os.path.join(output_dir, name + suffix) for name in names}
+        self.counts = {name: {} for name in names}
+        self._files = {}
+        try:
+            for name, path in self.paths.items():
+                self._files[name] = open_jsonl(path, "wb")
+        except BaseException:
+            self.close()
+            raise
+
+    def write(self, name, line, stratum):
+        self._files[name].write(line)
+        counts = self.counts[name]
+        counts[stratum] = counts.get(stratum, 0) + 1
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _report(writers, counts):
+    return {
+        "rows": counts["rows"],
+        "invalid": counts["invalid"],
+        "splits": {
+            name: {"path": writers.paths[name], "rows": sum(strata.values()), "strata": dict(sorted(strata.items()))}
+            for name, strata in writers.counts.items()
+        }
+    }
+
+
+def split_by_hash(input_file, output_dir, splits, stratify="type", key_field=None, seed=0,
+                  suffix=".jsonl"):
+    """
+    Stream rows into fraction-sized splits by hashing their key
+
+    Args:
+        input_file (str): Source JSONL (plain or compressed)
+        output_dir (str): Directory for the split files
+        splits (list): (name, fraction or "rest") pairs; fractions may sum to
+            less than 1, in which case unassigned rows are dropped unless a
+            "rest" split collects them
+        stratify (str): Stratum for the report (hashing is stratum-blind and
+            proportional in expectation)
+        key_field (str or tuple): Field(s) whose value decides the split (None: the whole row)
+        seed (int): Salt for the hash; the same seed gives the same splits
+        suffix (str): Split file suffix (.jsonl.gz etc. to compress)
+
+    Returns:
+        dict: Report with per-split, per-stratum row counts
+    """
+    _check_splits(splits)
+    bounds = []
+    total = 0.0
+    for name, fraction in splits:
+        if fraction != REST:
+            total += fraction
+            bounds.append((total, name))
+    rest = next((name for name, value in splits if value == REST), None)
+    stratum_of = stratum_function(stratify)
+    counts = {"rows": 0, "invalid": 0}
+
+    with _SplitWriters(output_dir, [name for name, _ in splits], suffix) as writers:
+        for line, stratum, point in _iter_rows(input_file, key_field, stratum_of, str(seed).encode(), counts):
+            counts["rows"] += 1
+            target = next((name for bound, name in bounds if point < bound), rest)
+            if target is not None:
+                writers.write(target, line, stratum)
+    return _report(writers, counts)
+
+
+def _allocate(quota, weights, available):
+    """
+    Split `quota` rows over strata in proportion to `weights` (largest remainder)
+
+    No stratum gets more than `available[stratum]` rows; whatever a capped
+    stratum cannot take is shared out again over the strata that still have
+    rows. Raises ValueError if the strata cannot cover the quota together.
+    """
+    allocation = dict.fromkeys(weights, 0)
+    remaining = quota
+    while remaining:
+        open_strata = {stratum: weight for stratum, weight in weights.items()
+                       if available[stratum] > allocation[stratum]}
+        if not open_strata:
+            raise ValueError(f"{remaining} of {quota} rows could not be allocated to any stratum")
+        total = sum(open_strata.values())
+        if total:
+            shares = {stratum: remaining * weight / total for stratum, weight in open_strata.items()}
+        else:
+            shares = {stratum: remaining / len(open_strata) for stratum in open_strata}
+        step = {stratum: int(share) for stratum, share in shares.items()}
+        for stratum in sorted(shares, key=lambda s: (step[s] - shares[s], s))[:remaining - sum(step.values())]:
+            step[stratum] += 1
+        for stratum, count in step.items():
+            count = min(count, available[stratum] - allocation[stratum])
+            allocation[stratum] += count
+            remaining -= count
+    return allocation
+
+
+def split_by_reservoir(input_file, output_dir, splits, stratify="type", key_field=None, seed=0,
+                       suffix=".jsonl"):
+    """
+    Draw exactly sized, exactly stratified splits in one pass
+
+    Args:
+        input_file (str): Source JSONL (plain or compressed)
+        output_dir (str): Directory for the split files
+        splits (list): (name, row count or "rest") pairs
+        stratify (str): Stratum name or dotted field path
+        key_field (str or tuple): Field(s) hashed into the row priority (None: the whole row)
+        seed (int): Salt for the priorities; the same seed gives the same splits
+        suffix (str): Split file suffix (.jsonl.gz etc. to compress)
+
+    Returns:
+        dict: Report with per-split, per-stratum row counts
+    """
+    _check_splits(splits)
+    sized = [(name, count) for name, count in splits if count != REST]
+    capacity = sum(count for _, count in sized)
+    rest = next((name for name, value in splits if value == REST), None)
+    stratum_of = stratum_function(stratify)
+    counts = {"rows": 0, "invalid": 0}
+    # stratum -> heap of (-priority, sequence, line): the root is the row to evict next
+    reservoirs = {}
+    sizes = {}
+
+    with _SplitWriters(output_dir, [name for name, _ in splits], suffix) as writers:
+        for seq, (line, stratum, point) in enumerate(_iter_rows(input_file, key_field, stratum_of,
+                                                                  str(seed).encode(), counts)):
+            counts["rows"] += 1
+            sizes[stratum] = sizes.get(stratum, 0) + 1
+            heap = reservoirs.setdefault(stratum, [])
+            item = (-point, seq, line)
+            if len(heap) < capacity:
+                heapq.heappush(heap, item)
+                continue
+            if heap and item > heap[0]:
+                item = heapq.heapreplace(heap, item)
+            if rest is not None:
+                writers.write(rest, item[2], stratum)
+
+        if capacity > counts["rows"]:
+            raise ValueError(f"Splits ask for {capacity} rows but {input_file} has {counts['rows']}")
+        # Lowest priority first within each stratum; count splits take their share in order
+        ordered = {stratum: sorted(heap, reverse=True) for stratum, heap in reservoirs.items()}
+        taken = dict.fromkeys(ordered, 0)
+        for name, count in sized:
+            # Each split is stratified over the rows earlier splits left, capped by what the reservoirs still hold
+            weights = {stratum: sizes[stratum] - taken[stratum] for stratum in ordered}
+            available = {stratum: len(rows) - taken[stratum] for stratum, rows in ordered.items()}
+            for stratum, quota in _allocate(count, weights, available).items():
+                for _, _, line in ordered[stratum][taken[stratum]:taken[stratum] + quota]:
+                    writers.write(name, line, stratum)
+                taken[stratum] += quota
+        if rest is not None:
+            for stratum, rows in ordered.items():
+                for _, _, line in rows[taken[stratum]:]:
+                    writers.write(rest, line, stratum)
+    return _report(writers, counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split a JSONL dataset into stratified splits or subsets in one pass")
+    parser.add_argument("input_file")
+    parser.add_argument("output_dir")
+    parser.add_argument("splits", nargs="+", help="name=fraction (hash) or name=count (reservoir); name=rest for the remainder")
+    parser.add_argument("--mode", choices=["hash", "reservoir"], default="hash")
+    parser.add_argument("--stratify", default="type", help="type, category, difficulty, none or a dotted field path")
+    parser.add_argument("--key-field", nargs="+", help="Field(s) hashed to assign rows (default: the whole row)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--suffix", default=".jsonl", help="Split file suffix, e.g. .jsonl.gz")
+    parser.add_argument("--report", help="Write the per-split counts as JSON to this path")
+    args = parser.parse_args(argv)
+
+    key_field = args.key_field
+    if key_field is not None:
+        key_field = key_field[0] if len(key_field) == 1 else tuple(key_field)
+    try:
+        splits = [parse_split(spec, args.mode) for spec in args.splits]
+        _check_splits(splits)
+    except ValueError as e:
+        parser.error(str(e))
+    split = split_by_hash if args.mode == "hash" else split_by_reservoir
+    report = split(args.input_file, args.output_dir, splits, args.stratify, key_field, args.seed, args.suffix)
+
+    print(f"Split {report['rows']} rows ({report['invalid']} invalid lines skipped)")
+    for name, info in report["splits"].items():
+        strata = ", ".join(f"{stratum or '-'}: {count}" for stratum, count in info["strata"].items())
+        print(f"  {name:<12} {info['rows']:>8} rows -> {info['path']}  [{strata}]")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
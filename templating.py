@@ -0,0 +1,205 @@
+import random
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+# Template-level keys of dataset_templates that are not fill tables
+RESERVED_KEYS = ("questions", "substitutions", "responses")
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class CompiledTemplate:
+    """
+    A template string split once into literal text and placeholder slots
+
+    Placeholders with a fill table become slots; placeholders listed in
+    `constants` are folded into the literal text; anything else is kept
+    verbatim, exactly as a chain of str.replace calls would leave it.
+    Every occurrence of a placeholder gets the same value in one render.
+
+    Args:
+        text (str): Template text with {name} placeholders
+        fills (dict): name -> list of values to choose from
+        constants (dict): name -> fixed replacement text
+    """
+
+    __slots__ = ("text", "slots", "choices", "_parts", "_positions")
+
+    def __init__(self, text, fills, constants=None):
+        constants = constants or {}
+        self.text = text
+        parts = []
+        positions = []
+        slots = []
+        literal = ""
+        last = 0
+
+        for match in _PLACEHOLDER.finditer(text):
+            name = match.group(1)
+            literal += text[last:match.start()]
+            last = match.end()
+            if name in fills:
+                if name not in slots:
+                    slots.append(name)
+                parts.append(literal)
+                positions.append((len(parts), slots.index(name)))
+                parts.append(None)
+                literal = ""
+            elif name in constants:
+                literal += constants[name]
+            else:
+                literal += match.group(0)
+        parts.append(literal + text[last:])
+
+        self.slots = tuple(slots)
+        self.choices = tuple(tuple(fills[name]) for name in slots)
+        self._parts = parts
+        self._positions = tuple(positions)
+
+    def render(self, rng=random):
+        """Render with one random value per slot"""
+        parts = self._parts[:]
+        picked = [rng.choice(values) for values in self.choices]
+        for position, slot in self._positions:
+            parts[position] = picked[slot]
+        return "".join(parts)
+
+    def size(self):
+        """Number of slot assignments (product of the slot table sizes)"""
+        total = 1
+        for values in self.choices:
+            total *= len(values)
+        return total
+
+    def unrank(self, index):
+        """Render the slot assignment with the given index in [0, size())"""
+        parts = self._parts[:]
+        picked = []
+        # Mixed radix: the first slot is the least significant digit
+        for values in self.choices:
+            index, digit = divmod(index, len(values))
+            picked.append(values[digit])
+        for position, slot in self._positions:
+            parts[position] = picked[slot]
+        return "".join(parts)
+
+    def count(self, text):
+        """Number of slot assignments whose rendering is exactly `text`"""
+        parts = self._parts
+        positions = dict(self._positions)
+        picked = [None] * len(self.slots)
+
+        def match(part, offset):
+            if part == len(parts):
+                return int(offset == len(text))
+            if part not in positions:
+                literal = parts[part]
+                return match(part + 1, offset + len(literal)) if text.startswith(literal, offset) else 0
+            slot = positions[part]
+            if picked[slot] is not None:
+                value = self.choices[slot][picked[slot]]
+                return match(part + 1, offset + len(value)) if text.startswith(value, offset) else 0
+            total = 0
+            for digit, value in enumerate(self.choices[slot]):
+                if text.startswith(value, offset):
+                    picked[slot] = digit
+                    total += match(part + 1, offset + len(value))
+            picked[slot] = None
+            return total
+
+        return match(0, 0)
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.text!r}, slots={self.slots})"
+
+
+class TemplateSpace:
+    """
+    Every rendering of a sequence of compiled templates, addressable by index
+
+    Index ranges are laid out template after template, so unrank() is a
+    bisect over the cumulative template sizes followed by a mixed-radix
+    decode of the slot values.
+    """
+
+    __slots__ = ("templates", "size", "_ends")
+
+    def __init__(self, templates):
+        self.templates = tuple(templates)
+        self._ends = list(accumulate(template.size() for template in self.templates))
+        self.size = self._ends[-1] if self._ends else 0
+
+    def __len__(self):
+        return self.size
+
+    def unrank(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(f"index {index} out of range for a space of {self.size}")
+        i = bisect_right(self._ends, index)
+        start = self._ends[i - 1] if i else 0
+        return self.templates[i].unrank(index - start)
+
+    def count(self, text):
+        """Number of indices whose rendering is exactly `text`"""
+        return sum(template.count(text) for template in self.templates)
+
+
+def iter_permutation(n, rng=random):
+    """
+    Lazily yield a uniformly random permutation of range(n)
+
+    Sparse Fisher-Yates: only displaced positions are stored, so each draw
+    is O(1) and memory grows with the number of draws, not with n.
+    """
+    displaced = {}
+    for i in range(n):
+        j = rng.randrange(i, n)
+        value = displaced.get(j, j)
+        if j != i:
+            displaced[j] = displaced.get(i, i)
+        displaced.pop(i, None)
+        yield value
+
+
+class CategoryTemplates(namedtuple("CategoryTemplates", ["questions", "responses"])):
+    """Compiled question and response templates for one dataset_templates category"""
+
+    __slots__ = ()
+
+    def pair_space(self):
+        """Size of the (question, response) space and an unranker over it"""
+        questions = TemplateSpace(self.questions)
+        responses = TemplateSpace(self.responses)
+
+        def unrank(index):
+            q, r = divmod(index, responses.size)
+            return questions.unrank(q), responses.unrank(r)
+
+        return questions.size * responses.size, unrank
+
+    def pair_count(self, question, response):
+        """Number of indices of pair_space() that render to (question, response)"""
+        count = TemplateSpace(self.questions).count(question)
+        return count * TemplateSpace(self.responses).count(response) if count else 0
+
+
+def compile_dataset_templates(dataset_templates):
+    """
+    Compile an improvedversion3/4-style dataset_templates dict
+
+    Questions are filled from the category's "substitutions" table. Responses
+    are filled from every other non-reserved list in the category, and a
+    {key_cap} placeholder becomes key.capitalize() for any template-level
+    key except "responses", matching the original replace loop.
+    """
+    compiled = {}
+    for category, template in dataset_templates.items():
+        fills = {key: values for key, values in template.items() if key not in RESERVED_KEYS}
+        constants = {f"{key}_cap": key.capitalize() for key in template if key != "responses"}
+        compiled[category] = CategoryTemplates(
+            questions=tuple(CompiledTemplate(q, template["substitutions"]) for q in template["questions"]),
+            responses=tuple(CompiledTemplate(r, fills, constants) for r in template["responses"])
+        )
+    return compiled
@@ -1,6 +1,6 @@
-import json
 from faker import Faker
 import random
+from serializer import JsonlWriter, RowEncoder
 
 fake = Faker()
 
@@ -52,7 +52,9 @@ def generate_asean_question():
     }
 
 # Generate 500 high-impact rows
-with open("train.jsonl", "w") as f:
+# Flat rows: the key skeleton is pre-encoded once, values are spliced in per row
+encode_row = RowEncoder(["instruction", "context", "response"])
+with JsonlWriter("train.jsonl", encode_row) as f:
     for _ in range(500):
         # 40% trap questions, 40% ASEAN-specific, 20% technical deep dives
         if random.random() < 0.4:
@@ -67,6 +69,6 @@ with open("train.jsonl", "w") as f:
                 "response": f"AWS provides advantage through [specific feature] crucial for [ASEAN market condition]."
             }
         
-        f.write(json.dumps(entry) + "\n")
+        f.write(entry)
 
 print("Dataset generated. Validate at https://aws-llm-league.com/validate-training-data")
\ No newline at end of file
@@ -0,0 +1,93 @@
+import random
+from array import array
+
+from faker import Faker
+
+
+class TextPool:
+    """
+    Faker-compatible source of seeded, reused filler text
+
+    Sentences, words and paragraphs are kept in pools, one pool per length
+    bucket (the max_nb_chars passed to text()). A bucket grows on demand:
+    until it holds `pool_size` items every draw is a fresh Faker value that
+    joins the pool, so a run with fewer draws costs what Faker alone does.
+    Once full, a draw is an O(1) index into the pool. Each pooled item is
+    handed out at most `max_reuse` times before it is replaced with a fresh
+    Faker value, which bounds how often the same filler shows up in a run.
+
+    Drop-in for the Faker methods the generators use: sentence(), text(),
+    word() and seed_instance().
+
+    Args:
+        seed (int): Seed for both the underlying Faker and the draw order
+        pool_size (int): Maximum number of items per bucket
+        max_reuse (int): Draws per item before it is regenerated (None: never)
+        locale (str): Faker locale (default: Faker's default)
+    """
+
+    def __init__(self, seed=None, pool_size=4096, max_reuse=8, locale=None):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        if max_reuse is not None and max_reuse < 1:
+            raise ValueError("max_reuse must be at least 1 or None")
+
+        self.pool_size = pool_size
+        self.max_reuse = max_reuse
+        self._faker = Faker(locale)
+        self._rng = random.Random()
+        self._buckets = {}
+        self.seed_instance(seed)
+
+    def seed_instance(self, seed=None):
+        """Reseed the pool; buckets are rebuilt lazily from the new seed"""
+        self._faker.seed_instance(seed)
+        self._rng.seed(seed)
+        self._buckets.clear()
+
+    def _bucket(self, key, factory):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = ([], array("I"), factory)
+        return bucket
+
+    def _draw(self, key, factory):
+        items, uses, factory = self._bucket(key, factory)
+        if len(items) < self.pool_size:
+            item = factory()
+            items.append(item)
+            uses.append(1)
+            return item
+        i = self._rng.randrange(len(items))
+        if self.max_reuse is not None:
+            if uses[i] >= self.max_reuse:
+                items[i] = factory()
+                uses[i] = 0
+            uses[i] += 1
+        return items[i]
+
+    def warm(self, text_lengths=(200,)):
+        """Fill the sentence, word and text buckets up front, for long runs that want no growth phase"""
+        buckets = [(("sentence",), self._faker.sentence), (("word",), self._faker.word)]
+        buckets += [
+            (("text", max_nb_chars), lambda n=max_nb_chars: self._faker.text(max_nb_chars=n))
+            for max_nb_chars in text_lengths
+        ]
+        for key, factory in buckets:
+            items, uses, factory = self._bucket(key, factory)
+            while len(items) < self.pool_size:
+                items.append(factory())
+                uses.append(0)
+        return self
+
+    def sentence(self):
+        return self._draw(("sentence",), self._faker.sentence)
+
+    def word(self):
+        return self._draw(("word",), self._faker.word)
+
+    def text(self, max_nb_chars=200):
+        return self._draw(
+            ("text", max_nb_chars),
+            lambda: self._faker.text(max_nb_chars=max_nb_chars)
+        )
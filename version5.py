@@ -135,16 +135,20 @@ def generate_multi_hop_question(category):
         "response": response
     }
 
-# Generate 10,000 high-quality rows
-with open("high_quality_dataset.jsonl", "w") as f:
-    for _ in range(10000):
-        category = random.choice(list(CATEGORIES.keys()))
-        if random.random() < 0.3:  # 30% trap questions
-            entry = generate_trap_question(category)
-        elif random.random() < 0.6:  # 30% multi-hop reasoning
-            entry = generate_multi_hop_question(category)
-        else:  # 40% standard high-quality questions
-            entry = generate_question(category, random.choice(CATEGORIES[category]))
-        f.write(json.dumps(entry) + "\n")
+# One row from a random category
+def generate_entry():
+    category = random.choice(list(CATEGORIES.keys()))
+    if random.random() < 0.3:  # 30% trap questions
+        return generate_trap_question(category)
+    elif random.random() < 0.6:  # 30% multi-hop reasoning
+        return generate_multi_hop_question(category)
+    else:  # 40% standard high-quality questions
+        return generate_question(category, random.choice(CATEGORIES[category]))
 
-print("High-quality dataset generated. Validate and fine-tune your model for competition success!")
\ No newline at end of file
+if __name__ == "__main__":
+    # Generate 10,000 high-quality rows
+    with open("high_quality_dataset.jsonl", "w") as f:
+        for _ in range(10000):
+            f.write(json.dumps(generate_entry()) + "\n")
+
+    print("High-quality dataset generated. Validate and fine-tune your model for competition success!")
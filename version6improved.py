@@ -1,7 +1,8 @@
-import json
 import random
 from datetime import date
 from faker import Faker
+from kbindex import compile_knowledge_base
+from serializer import JsonlWriter
 
 fake = Faker()
 today = date.today().isoformat()
@@ -81,36 +82,34 @@ QUALITY_TEMPLATES = {
 # Expanded Validation Levels
 VALIDATION_LEVELS = ["peer_reviewed", "industry_validated", "research_paper", "expert_verified"]
 
+# Compiled once at startup; generators only do index lookups
+KB = compile_knowledge_base(KNOWLEDGE_BASE, QUALITY_TEMPLATES)
+
 # Function to get category concepts
 def get_category_concepts(category):
-    return list(KNOWLEDGE_BASE[category].keys())
+    return KB.concepts[category]
 
 # Function to generate verified responses
 def get_verified_response(category, concept):
-    kb_entry = KNOWLEDGE_BASE[category][concept]
-    return (
-        f"{kb_entry['definition'].capitalize()}. "
-        f"Key methods include: {', '.join(kb_entry['methods'][:3])}. "
-        f"Real-world example: {random.choice(kb_entry['examples'])}. "
-        f"(Sources: {', '.join(kb_entry['sources'])})"
-    )
+    kb_entry = KB.entries[category, concept]
+    return f"{kb_entry.verified_prefix}{random.choice(kb_entry.examples)}{kb_entry.verified_suffix}"
 
 # Function to generate core questions
 def generate_core_question(category):
     concepts = get_category_concepts(category)
     concept = random.choice(concepts)
-    template = random.choice(list(QUALITY_TEMPLATES.keys()))
+    template = random.choice(KB.template_names)
     
     if template == "Comparison":
-        concept2 = random.choice([c for c in concepts if c != concept])
+        concept2 = random.choice(KB.others[category, concept])
         question = QUALITY_TEMPLATES[template].format(
             concept1=concept,
             concept2=concept2,
             category=category
         )
         response = (
-            f"1) {concept}: {KNOWLEDGE_BASE[category][concept]['definition']}\n"
-            f"2) {concept2}: {KNOWLEDGE_BASE[category][concept2]['definition']}\n"
+            f"1) {concept}: {KB.entries[category, concept].definition}\n"
+            f"2) {concept2}: {KB.entries[category, concept2].definition}\n"
             f"Key difference: {random.choice(['scope', 'implementation', 'target applications'])}"
         )
     else:
@@ -141,8 +140,8 @@ def generate_trap_question(category):
     if trap_type == "misconception":
         question = f"Why is {concept} considered harmful for AI systems?"
         response = (
-            f"Common misconception: {concept} actually {KNOWLEDGE_BASE[category][concept]['definition'].lower()}. "
-            f"Proper implementation enables {random.choice(KNOWLEDGE_BASE[category][concept]['examples'])}."
+            f"Common misconception: {concept} actually {KB.entries[category, concept].definition_lower}. "
+            f"Proper implementation enables {random.choice(KB.entries[category, concept].examples)}."
         )
     elif trap_type == "outdated":
         question = f"Describe the 2010 approach to {concept}"
@@ -151,24 +150,23 @@ def generate_trap_question(category):
             f"2010 methods were limited to {random.choice(['simpler datasets', 'manual feature engineering', 'single-task models'])}."
         )
     elif trap_type == "oversimplification":
-        other_concepts = [c for c in concepts if c != concept]
-        other_concept = random.choice(other_concepts)
+        other_concept = random.choice(KB.others[category, concept])
         question = f"Can {concept} solve all {category} challenges?"
         response = (
-            f"Oversimplification alert: While {concept} addresses {random.choice(KNOWLEDGE_BASE[category][concept]['methods'])}, "
-            f"it doesn't handle {other_concept} which requires {random.choice(KNOWLEDGE_BASE[category][other_concept]['methods'])}."
+            f"Oversimplification alert: While {concept} addresses {random.choice(KB.entries[category, concept].methods)}, "
+            f"it doesn't handle {other_concept} which requires {random.choice(KB.entries[category, other_concept].methods)}."
         )
     elif trap_type == "false_causality":
         question = f"Does {concept} directly cause {fake.word()} in AI systems?"
         response = (
-            f"False causality: {concept} influences {random.choice(KNOWLEDGE_BASE[category][concept]['methods'])}, "
+            f"False causality: {concept} influences {random.choice(KB.entries[category, concept].methods)}, "
             f"but it doesn't directly cause {fake.word()}. Correlation ≠ causation."
         )
     else:  # strawman_argument
         question = f"Is {concept} just a buzzword with no real impact?"
         response = (
             f"Strawman argument: {concept} is a well-established approach with "
-            f"{random.choice(KNOWLEDGE_BASE[category][concept]['examples'])} as evidence of its impact."
+            f"{random.choice(KB.entries[category, concept].examples)} as evidence of its impact."
         )
     
     return {
@@ -185,7 +183,7 @@ def generate_trap_question(category):
 # Function to generate dataset
 def generate_dataset(num_entries):
     dataset = []
-    categories = list(KNOWLEDGE_BASE.keys())
+    categories = KB.categories
     
     for _ in range(num_entries):
         category = random.choice(categories)
@@ -205,16 +203,17 @@ def generate_dataset(num_entries):
     
     return dataset
 
-# Generate and save 50,000 entries
-dataset = generate_dataset(50000)
+if __name__ == "__main__":
+    # Generate and save 50,000 entries
+    dataset = generate_dataset(50000)
 
-with open("train50kv2.jsonl", "w") as f:
-    for entry in dataset:
-        f.write(json.dumps(entry) + "\n")
+    with JsonlWriter("train50kv2.jsonl") as f:
+        for entry in dataset:
+            f.write(entry)
 
-print(f"Generated dataset with {len(dataset)} entries")
-print("File structure:")
-print("- instruction: Question/prompt")
-print("- context: Category and validation info")
-print("- response: Verified accurate answer")
-print("- metadata: Tracking and quality info")
\ No newline at end of file
+    print(f"Generated dataset with {len(dataset)} entries")
+    print("File structure:")
+    print("- instruction: Question/prompt")
+    print("- context: Category and validation info")
+    print("- response: Verified accurate answer")
+    print("- metadata: Tracking and quality info")
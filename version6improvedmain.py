@@ -1,10 +1,21 @@
-import json
+import os
 import random
+import shutil
 from datetime import date
 from faker import Faker
+from textpool import TextPool
+import numpy as np
 from multiprocessing import Pool
+from kbindex import compile_knowledge_base
+from adaptive import AdaptiveSampler, RecentWindow
+from seenindex import SeenIndex
+from keystore import DigestSet, key_digests
+from serializer import JsonlWriter, get_dumps
+from shardwriter import ShardFile, write_manifest
 
-fake = Faker()
+# Pre-generated filler text; set USE_TEXT_POOL = False to call Faker on every row
+USE_TEXT_POOL = True
+fake = TextPool() if USE_TEXT_POOL else Faker()
 today = date.today().isoformat()
 
 # Expanded Knowledge Base
@@ -82,36 +93,44 @@ QUALITY_TEMPLATES = {
 # Expanded Validation Levels
 VALIDATION_LEVELS = ["peer_reviewed", "industry_validated", "research_paper", "expert_verified"]
 
+# Compiled once at startup; generators only do index lookups
+KB = compile_knowledge_base(KNOWLEDGE_BASE, QUALITY_TEMPLATES)
+
+TRAP_TYPES = ["misconception", "outdated", "oversimplification", "false_causality", "strawman_argument"]
+TRAP_RATIO = 0.25
+
+# Back off templates and trap types that mostly yield duplicates, within MAX_MIX_DRIFT of the configured mix
+ADAPTIVE_SAMPLING = True
+MAX_MIX_DRIFT = 0.1
+# Recent questions a unit's sampler remembers for the duplicate signal
+SAMPLER_HISTORY = 1 << 15
+
 # Function to get category concepts
 def get_category_concepts(category):
-    return list(KNOWLEDGE_BASE[category].keys())
+    return KB.concepts[category]
 
 # Function to generate verified responses
 def get_verified_response(category, concept):
-    kb_entry = KNOWLEDGE_BASE[category][concept]
-    return (
-        f"{kb_entry['definition'].capitalize()}. "
-        f"Key methods include: {', '.join(kb_entry['methods'][:3])}. "
-        f"Real-world example: {random.choice(kb_entry['examples'])}. "
-        f"(Sources: {', '.join(kb_entry['sources'])})"
-    )
+    kb_entry = KB.entries[category, concept]
+    return f"{kb_entry.verified_prefix}{random.choice(kb_entry.examples)}{kb_entry.verified_suffix}"
 
 # Function to generate core questions
-def generate_core_question(category):
+def generate_core_question(category, template=None):
     concepts = get_category_concepts(category)
     concept = random.choice(concepts)
-    template = random.choice(list(QUALITY_TEMPLATES.keys()))
+    if template is None:
+        template = random.choice(KB.template_names)
     
     if template == "Comparison":
-        concept2 = random.choice([c for c in concepts if c != concept])
+        concept2 = random.choice(KB.others[category, concept])
         question = QUALITY_TEMPLATES[template].format(
             concept1=concept,
             concept2=concept2,
             category=category
         )
         response = (
-            f"1) {concept}: {KNOWLEDGE_BASE[category][concept]['definition']}\n"
-            f"2) {concept2}: {KNOWLEDGE_BASE[category][concept2]['definition']}\n"
+            f"1) {concept}: {KB.entries[category, concept].definition}\n"
+            f"2) {concept2}: {KB.entries[category, concept2].definition}\n"
             f"Key difference: {random.choice(['scope', 'implementation', 'target applications'])}"
         )
     else:
@@ -134,16 +153,17 @@ def generate_core_question(category):
     }
 
 # Function to generate trap questions
-def generate_trap_question(category):
+def generate_trap_question(category, trap_type=None):
     concepts = get_category_concepts(category)
     concept = random.choice(concepts)
-    trap_type = random.choice(["misconception", "outdated", "oversimplification", "false_causality", "strawman_argument"])
+    if trap_type is None:
+        trap_type = random.choice(TRAP_TYPES)
     
     if trap_type == "misconception":
         question = f"Why is {concept} considered harmful for AI systems?"
         response = (
-            f"Common misconception: {concept} actually {KNOWLEDGE_BASE[category][concept]['definition'].lower()}. "
-            f"Proper implementation enables {random.choice(KNOWLEDGE_BASE[category][concept]['examples'])}."
+            f"Common misconception: {concept} actually {KB.entries[category, concept].definition_lower}. "
+            f"Proper implementation enables {random.choice(KB.entries[category, concept].examples)}."
         )
     elif trap_type == "outdated":
         question = f"Describe the 2010 approach to {concept}"
@@ -152,24 +172,23 @@ def generate_trap_question(category):
             f"2010 methods were limited to {random.choice(['simpler datasets', 'manual feature engineering', 'single-task models'])}."
         )
     elif trap_type == "oversimplification":
-        other_concepts = [c for c in concepts if c != concept]
-        other_concept = random.choice(other_concepts)
+        other_concept = random.choice(KB.others[category, concept])
         question = f"Can {concept} solve all {category} challenges?"
         response = (
-            f"Oversimplification alert: While {concept} addresses {random.choice(KNOWLEDGE_BASE[category][concept]['methods'])}, "
-            f"it doesn't handle {other_concept} which requires {random.choice(KNOWLEDGE_BASE[category][other_concept]['methods'])}."
+            f"Oversimplification alert: While {concept} addresses {random.choice(KB.entries[category, concept].methods)}, "
+            f"it doesn't handle {other_concept} which requires {random.choice(KB.entries[category, other_concept].methods)}."
         )
     elif trap_type == "false_causality":
         question = f"Does {concept} directly cause {fake.word()} in AI systems?"
         response = (
-            f"False causality: {concept} influences {random.choice(KNOWLEDGE_BASE[category][concept]['methods'])}, "
+            f"False causality: {concept} influences {random.choice(KB.entries[category, concept].methods)}, "
             f"but it doesn't directly cause {fake.word()}. Correlation ≠ causation."
         )
     else:  # strawman_argument
         question = f"Is {concept} just a buzzword with no real impact?"
         response = (
             f"Strawman argument: {concept} is a well-established approach with "
-            f"{random.choice(KNOWLEDGE_BASE[category][concept]['examples'])} as evidence of its impact."
+            f"{random.choice(KB.entries[category, concept].examples)} as evidence of its impact."
         )
     
     return {
@@ -183,13 +202,38 @@ def generate_trap_question(category):
         }
     }
 
+# Samplers and a bounded window of the questions they produced recently; reset at the
+# start of every work unit so a unit's output depends only on its own seed
+_samplers = {}
+_sampler_history = {}
+
+# Function to get the adaptive sampler of a category
+def get_category_sampler(category):
+    sampler = _samplers.get(category)
+    if sampler is None:
+        # Configured mix: TRAP_RATIO trap questions, the rest core questions, uniform within each
+        weights = {("core", template): (1 - TRAP_RATIO) / len(KB.template_names) for template in KB.template_names}
+        weights.update({("trap", trap_type): TRAP_RATIO / len(TRAP_TYPES) for trap_type in TRAP_TYPES})
+        sampler = _samplers[category] = AdaptiveSampler(weights, max_drift=MAX_MIX_DRIFT)
+        _sampler_history[category] = RecentWindow(SAMPLER_HISTORY)
+    return sampler
+
 # Function to generate dataset for a single category
 def generate_category_dataset(category, num_questions):
     dataset = []
     seen_questions = set()
+    sampler = get_category_sampler(category) if ADAPTIVE_SAMPLING else None
+    history = _sampler_history.get(category)
     
     while len(dataset) < num_questions:
-        if random.random() < 0.25:  # 25% trap questions
+        if sampler is not None:
+            kind, arm = sampler.choose()
+            if kind == "trap":
+                entry = generate_trap_question(category, trap_type=arm)
+            else:
+                entry = generate_core_question(category, template=arm)
+            sampler.record((kind, arm), history.seen(entry["instruction"]))
+        elif random.random() < TRAP_RATIO:  # 25% trap questions
             entry = generate_trap_question(category)
         else:
             entry = generate_core_question(category)
@@ -205,25 +249,262 @@ def generate_category_dataset(category, num_questions):
     
     return dataset
 
+# Rows per work unit; small units keep every core busy until the end of the run
+CHUNK_SIZE = 500
+# Upper bound on how many extra rows a top-up round may request per missing row
+MAX_TOPUP_FACTOR = 20
+# Consecutive top-up rounds without a single new question before a category counts as exhausted
+MAX_STALLED_ROUNDS = 3
+
+def _plan_units(quotas, chunk_size):
+    # Round-robin over categories so no category's units bunch up at the tail
+    chunks = {
+        category: [min(chunk_size, remaining - start) for start in range(0, remaining, chunk_size)]
+        for category, remaining in quotas.items()
+    }
+    units = []
+    while any(chunks.values()):
+        for category, sizes in chunks.items():
+            if sizes:
+                units.append((category, sizes.pop(0)))
+    return units
+
+# Function to plan the next round's demand per category from what the last round yielded
+def _top_up_demand(num_questions_per_category, counts, received, accepted, stalled_rounds):
+    for category in counts:
+        missing = counts[category] < num_questions_per_category
+        stalled_rounds[category] = stalled_rounds[category] + 1 if missing and not accepted[category] else 0
+    stalled = [category for category in counts if stalled_rounds[category] >= MAX_STALLED_ROUNDS]
+    if stalled:
+        raise RuntimeError(f"No new unique questions for {', '.join(stalled)}; category space exhausted")
+    # Oversize top-up units by the observed duplicate rate so the tail converges
+    demand = {}
+    for category in counts:
+        shortfall = num_questions_per_category - counts[category]
+        if not shortfall:
+            demand[category] = 0
+        elif not accepted[category]:
+            demand[category] = shortfall * MAX_TOPUP_FACTOR
+        else:
+            demand[category] = min(shortfall * MAX_TOPUP_FACTOR, -(-shortfall * received[category] // accepted[category]))
+    return demand
+
+# Seed random and Faker from the run seed and the unit's index, and start the unit's
+# category with a fresh sampler, so the output does not depend on which worker runs it
+def _seed_unit(root_seed, unit_index, category):
+    unit_seed = f"{root_seed}:{unit_index}"
+    random.seed(unit_seed)
+    fake.seed_instance(unit_seed)
+    _samplers.pop(category, None)
+    _sampler_history.pop(category, None)
+
+# Function to number planned (category, size) units from `first_index` on and attach the run seed
+def _seeded_units(units, root_seed, first_index):
+    return [(category, size, root_seed, first_index + i) for i, (category, size) in enumerate(units)]
+
+# Work unit: one chunk of a category's quota
+def generate_chunk(unit):
+    category, num_questions, root_seed, unit_index = unit
+    _seed_unit(root_seed, unit_index, category)
+    entries = generate_category_dataset(category, num_questions)
+    report = _samplers[category].report() if ADAPTIVE_SAMPLING else None
+    return category, entries, report
+
+# Function to print how far each category's sampling mix drifted, and why
+def print_sampler_reports(reports, top=3):
+    for category, report in reports.items():
+        if report is None:
+            continue
+        moved = [arm for arm in report["arms"] if arm["reason"] != "unchanged"][:top]
+        print(f"{category}: mix drift {report['drift']:.3f} (max {report['max_drift']})")
+        for arm in moved:
+            print(f"  {'/'.join(arm['arm'])}: {arm['base_weight']:.3f} -> {arm['weight']:.3f}, {arm['reason']}")
+
 # Main function to generate the full dataset
-def generate_dataset(num_entries):
-    categories = list(KNOWLEDGE_BASE.keys())
+def generate_dataset(num_entries, chunk_size=CHUNK_SIZE, processes=None, seed=None, seen_index=None, seen_factory=set,
+                     writer=None):
+    """
+    Generate the dataset with many small work units pulled by idle workers
+
+    Units are dispatched one at a time, so throughput scales with the
+    number of cores rather than the number of categories. Every unit
+    seeds random and Faker from `seed` and its index in the run, so the
+    same seed gives the same dataset whatever the number of processes or
+    the order in which workers pick up units. Duplicates across units are
+    dropped in the parent and topped up with further units. With a persistent `seen_index` (seenindex.SeenIndex),
+    questions emitted by earlier runs are dropped as well; record the new
+    rows in it once they are written.
+
+    `seen_factory` builds the per-category seen-sets of the parent; pass
+    e.g. bloom.ScalableBloomFilter for fixed-step memory on very large runs.
+    That only bounds the seen-sets: without a `writer` every accepted row is
+    still held until the end. With a `writer` (anything with a write(entry)
+    method, e.g. serializer.JsonlWriter) rows are written as they are
+    accepted, in arrival order rather than grouped by category, nothing is
+    kept, and the row count is returned instead of the rows; the new rows
+    are then also recorded in `seen_index` as they are written.
+    """
+    categories = KB.categories
     num_questions_per_category = num_entries // len(categories)
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    results = {category: [] for category in categories}
+    counts = dict.fromkeys(categories, 0)
+    seen_questions = {category: seen_factory() for category in categories}
+    sampler_reports = {}
+    stalled_rounds = dict.fromkeys(categories, 0)
+    next_unit = 0
     
-    with Pool() as pool:
-        results = pool.starmap(generate_category_dataset, [(cat, num_questions_per_category) for cat in categories])
+    with Pool(processes) as pool:
+        demand = {category: num_questions_per_category for category in categories}
+        while any(demand.values()):
+            received = dict.fromkeys(categories, 0)
+            accepted = dict.fromkeys(categories, 0)
+            units = _seeded_units(_plan_units(demand, chunk_size), seed, next_unit)
+            next_unit += len(units)
+            for category, entries, report in pool.imap(generate_chunk, units, chunksize=1):
+                sampler_reports[category] = report
+                received[category] += len(entries)
+                for entry in entries:
+                    if counts[category] == num_questions_per_category:
+                        break
+                    if entry["instruction"] not in seen_questions[category]:
+                        seen_questions[category].add(entry["instruction"])
+                        if seen_index is not None and entry["instruction"] in seen_index:
+                            continue
+                        if writer is None:
+                            results[category].append(entry)
+                        else:
+                            writer.write(entry)
+                            if seen_index is not None:
+                                seen_index.add(entry["instruction"])
+                        counts[category] += 1
+                        accepted[category] += 1
+            
+            demand = _top_up_demand(num_questions_per_category, counts, received, accepted, stalled_rounds)
     
-    dataset = [entry for sublist in results for entry in sublist]
+    if ADAPTIVE_SAMPLING:
+        print_sampler_reports(sampler_reports)
+    if writer is not None:
+        return sum(counts.values())
+    dataset = [entry for category in categories for entry in results[category]]
     return dataset
 
-# Generate and save 50,000 entries
-dataset = generate_dataset(50000)
+# Fast JSON backend shared by the shard workers
+dumps = get_dumps()
+
+# Work unit for shard mode: generate one chunk and write it to a part file. Only the line
+# lengths and 8-byte instruction digests go back to the parent, never the rows
+def write_chunk_part(unit):
+    category, num_questions, root_seed, unit_index, path = unit
+    _seed_unit(root_seed, unit_index, category)
+    entries = generate_category_dataset(category, num_questions)
+    lines = [dumps(entry) + b"\n" for entry in entries]
+    with open(path, "wb") as f:
+        f.writelines(lines)
+    lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    digests = key_digests([entry["instruction"] for entry in entries])
+    drift = _samplers[category].drift() if ADAPTIVE_SAMPLING else None
+    return category, path, lengths, digests, drift
+
+# Function to copy the kept lines of a part file into a committed shard, back-to-back lines in one write
+def _stitch_part(part_path, lengths, kept, shard_path):
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    starts, ends = starts[kept], ends[kept]
+    with open(part_path, "rb") as f:
+        data = f.read()
+    breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+    first = np.concatenate(([0], breaks))
+    last = np.concatenate((breaks - 1, [len(kept) - 1]))
+    shard_file = ShardFile(shard_path)
+    for i, j in zip(first.tolist(), last.tolist()):
+        shard_file.write_block(data[starts[i]:ends[j]], j - i + 1)
+    return shard_file.commit()
+
+def generate_dataset_shards(num_entries, out_dir, chunk_size=CHUNK_SIZE, processes=None, seed=None, output_file=None):
+    """
+    Generate the dataset with every worker writing its own JSONL part files
+
+    Workers serialize and write their rows locally and send back only the
+    line lengths and 8-byte instruction digests of each part, so no rows
+    are pickled back to the parent. The parent takes the parts in unit
+    order, keeps the first occurrence of every instruction per category
+    (a keystore.DigestSet each) up to the category's quota, copies just
+    those byte spans into a committed shard, and tops up short categories
+    with further units like generate_dataset does. `out_dir/manifest.json`
+    lists the shards with their true row counts, byte sizes and checksums;
+    if `output_file` is given, the shards are concatenated into it byte for
+    byte. Seeding is per unit as in generate_dataset.
+    """
+    categories = KB.categories
+    num_questions_per_category = num_entries // len(categories)
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    os.makedirs(out_dir, exist_ok=True)
+    counts = dict.fromkeys(categories, 0)
+    seen_questions = {category: DigestSet() for category in categories}
+    stalled_rounds = dict.fromkeys(categories, 0)
+    shards = []
+    next_unit = 0
+    
+    with Pool(processes) as pool:
+        demand = {category: num_questions_per_category for category in categories}
+        while any(demand.values()):
+            received = dict.fromkeys(categories, 0)
+            accepted = dict.fromkeys(categories, 0)
+            units = [
+                unit + (os.path.join(out_dir, f".part-{unit[3]:05d}.jsonl"),)
+                for unit in _seeded_units(_plan_units(demand, chunk_size), seed, next_unit)
+            ]
+            next_unit += len(units)
+            for category, part_path, lengths, digests, drift in pool.imap(write_chunk_part, units, chunksize=1):
+                received[category] += len(lengths)
+                missing = num_questions_per_category - counts[category]
+                kept = np.flatnonzero(seen_questions[category].add_digests(digests))[:missing]
+                if len(kept):
+                    shard = _stitch_part(part_path, lengths, kept, os.path.join(out_dir, f"shard-{len(shards):05d}.jsonl"))
+                    shard["category"] = category
+                    if drift is not None:
+                        shard["sampler_drift"] = drift
+                    shards.append(shard)
+                os.remove(part_path)
+                counts[category] += len(kept)
+                accepted[category] += len(kept)
+            
+            demand = _top_up_demand(num_questions_per_category, counts, received, accepted, stalled_rounds)
+    
+    manifest = write_manifest(out_dir, shards)
+    
+    if output_file:
+        with open(output_file, "wb") as out:
+            for shard in shards:
+                with open(os.path.join(out_dir, shard["path"]), "rb") as f:
+                    shutil.copyfileobj(f, out)
+    
+    return manifest
+
+if __name__ == "__main__":
+    # Set to True to have workers write the rows themselves; the parent only dedups their
+    # instruction digests and stitches the kept lines into shards. Both modes keep questions
+    # unique per category; only the batch mode below supports a seen-index
+    WRITE_SHARDS = False
+    # Persistent seen-index (see seenindex.py); when set, the batch mode skips questions
+    # from earlier runs and appends the new rows to train.jsonl instead of overwriting it
+    SEEN_INDEX = None
+
+    if WRITE_SHARDS:
+        # Generate 50,000 entries; workers write part files, the parent stitches them into shards
+        manifest = generate_dataset_shards(50000, "train_shards", output_file="train.jsonl")
+        print(f"Generated dataset with {manifest['rows']} entries in {len(manifest['shards'])} shards")
+    else:
+        # Generate 50,000 entries, writing each one as soon as the parent accepts it
+        seen_index = SeenIndex(SEEN_INDEX) if SEEN_INDEX else None
+
+        with JsonlWriter("train.jsonl", append=seen_index is not None) as f:
+            written = generate_dataset(50000, seen_index=seen_index, writer=f)
 
-# Write dataset in batches
-batch_size = 10000
-with open("train.jsonl", "w") as f:
-    for i in range(0, len(dataset), batch_size):
-        batch = dataset[i:i + batch_size]
-        f.write("\n".join(json.dumps(entry) for entry in batch) + "\n")
+        if seen_index is not None:
+            seen_index.close()
 
-print(f"Generated dataset with {len(dataset)} entries")
\ No newline at end of file
+        print(f"Generated dataset with {written} entries")
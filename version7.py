@@ -1,9 +1,15 @@
-import json
 import random
 from datetime import date
 from faker import Faker
+from textpool import TextPool
+from kbindex import compile_knowledge_base
+from planner import BatchPlanner, Categorical, IntRange
+from serializer import JsonlWriter
+from shardwriter import ShardedJsonlWriter
 
-fake = Faker()
+# Pre-generated filler text; set USE_TEXT_POOL = False to call Faker on every row
+USE_TEXT_POOL = True
+fake = TextPool() if USE_TEXT_POOL else Faker()
 today = date.today().isoformat()
 
 # Complete Knowledge Base with All Subtopics
@@ -265,33 +271,31 @@ QUALITY_TEMPLATES = {
 
 VALIDATION_LEVELS = ["peer_reviewed", "industry_validated", "research_paper"]
 
+# Compiled once at startup; generators only do index lookups
+KB = compile_knowledge_base(KNOWLEDGE_BASE, QUALITY_TEMPLATES)
+
 def get_category_concepts(category):
-    return list(KNOWLEDGE_BASE[category].keys())
+    return KB.concepts[category]
 
 def get_verified_response(category, concept):
-    kb_entry = KNOWLEDGE_BASE[category][concept]
-    return (
-        f"{kb_entry['definition'].capitalize()}. "
-        f"Key methods include: {', '.join(kb_entry['methods'][:3])}. "
-        f"Real-world example: {random.choice(kb_entry['examples'])}. "
-        f"(Sources: {', '.join(kb_entry['sources'])})"
-    )
+    kb_entry = KB.entries[category, concept]
+    return f"{kb_entry.verified_prefix}{random.choice(kb_entry.examples)}{kb_entry.verified_suffix}"
 
 def generate_core_question(category):
     concepts = get_category_concepts(category)
     concept = random.choice(concepts)
-    template = random.choice(list(QUALITY_TEMPLATES.keys()))
+    template = random.choice(KB.template_names)
     
     if template == "Comparison":
-        concept2 = random.choice([c for c in concepts if c != concept])
+        concept2 = random.choice(KB.others[category, concept])
         question = QUALITY_TEMPLATES[template].format(
             concept1=concept,
             concept2=concept2,
             category=category
         )
         response = (
-            f"1) {concept}: {KNOWLEDGE_BASE[category][concept]['definition']}\n"
-            f"2) {concept2}: {KNOWLEDGE_BASE[category][concept2]['definition']}\n"
+            f"1) {concept}: {KB.entries[category, concept].definition}\n"
+            f"2) {concept2}: {KB.entries[category, concept2].definition}\n"
             f"Key difference: {random.choice(['scope', 'implementation', 'target applications'])}"
         )
     else:
@@ -322,8 +326,8 @@ def generate_trap_question(category):
     if trap_type == "misconception":
         question = f"Why is {concept} considered harmful for AI systems?"
         response = (
-            f"Common misconception: {concept} actually {KNOWLEDGE_BASE[category][concept]['definition'].lower()}. "
-            f"Proper implementation enables {random.choice(KNOWLEDGE_BASE[category][concept]['examples'])}."
+            f"Common misconception: {concept} actually {KB.entries[category, concept].definition_lower}. "
+            f"Proper implementation enables {random.choice(KB.entries[category, concept].examples)}."
         )
     elif trap_type == "outdated":
         question = f"Describe the 2010 approach to {concept}"
@@ -332,12 +336,11 @@ def generate_trap_question(category):
             f"2010 methods were limited to {random.choice(['simpler datasets', 'manual feature engineering', 'single-task models'])}."
         )
     else:
-        other_concepts = [c for c in concepts if c != concept]
-        other_concept = random.choice(other_concepts)
+        other_concept = random.choice(KB.others[category, concept])
         question = f"Can {concept} solve all {category} challenges?"
         response = (
-            f"Oversimplification alert: While {concept} addresses {random.choice(KNOWLEDGE_BASE[category][concept]['methods'])}, "
-            f"it doesn't handle {other_concept} which requires {random.choice(KNOWLEDGE_BASE[category][other_concept]['methods'])}."
+            f"Oversimplification alert: While {concept} addresses {random.choice(KB.entries[category, concept].methods)}, "
+            f"it doesn't handle {other_concept} which requires {random.choice(KB.entries[category, other_concept].methods)}."
         )
     
     return {
@@ -352,14 +355,14 @@ def generate_trap_question(category):
     }
 
 def generate_multi_hop_question():
-    category1, category2 = random.sample(list(KNOWLEDGE_BASE.keys()), 2)
+    category1, category2 = random.sample(KB.categories, 2)
     concept1 = random.choice(get_category_concepts(category1))
     concept2 = random.choice(get_category_concepts(category2))
     
     question = f"How does {concept1} in {category1} influence {concept2} in {category2}?"
     response = (
-        f"1) {concept1} ({category1}): {KNOWLEDGE_BASE[category1][concept1]['definition']}\n"
-        f"2) {concept2} ({category2}): {KNOWLEDGE_BASE[category2][concept2]['definition']}\n"
+        f"1) {concept1} ({category1}): {KB.entries[category1, concept1].definition}\n"
+        f"2) {concept2} ({category2}): {KB.entries[category2, concept2].definition}\n"
         f"Interaction: {fake.text(max_nb_chars=300)}"
     )
     return {
@@ -391,61 +394,84 @@ def generate_evaluation_question(category):
         }
     }
 
-def generate_dataset(num_entries):
-    dataset = []
-    categories = list(KNOWLEDGE_BASE.keys())
+# Per-row attributes drawn in vectorized blocks by the batch planner
+ROW_PLAN = [
+    # Competition-optimized distribution
+    Categorical("question_type", ["core", "trap", "multi_hop", "evaluation"], [0.35, 0.4, 0.15, 0.1]),
+    Categorical("category", KB.categories),
+    Categorical("difficulty", ["easy", "medium", "hard"], [0.2, 0.5, 0.3]),
+    IntRange("competition_relevance", 7, 10),
+    IntRange("complexity", 2, 5),
+    Categorical("accuracy", [0.95, 0.97, 0.99]),
+    Categorical("educational_value", ["high", "very high"])
+]
+PLAN_BLOCK_SIZE = 65536
+
+# Set SHARD_DIR to write capped shards plus manifest.json there instead of one file
+SHARD_DIR = None
+SHARD_MAX_ROWS = 100000
+
+def iter_dataset(num_entries, seed=None, block_size=PLAN_BLOCK_SIZE):
+    """Yield entries one at a time instead of materializing the whole dataset"""
+    planner = BatchPlanner(ROW_PLAN, seed=seed)
     
-    for _ in range(num_entries):
-        # Competition-optimized distribution
-        question_type = random.choices(
-            ["core", "trap", "multi_hop", "evaluation"],
-            weights=[0.35, 0.4, 0.15, 0.1]
-        )[0]
-        
+    for (question_type, category, difficulty, relevance,
+         complexity, accuracy, educational_value) in planner.iter_rows(num_entries, block_size):
         if question_type == "trap":
-            category = random.choice(categories)
             entry = generate_trap_question(category)
         elif question_type == "multi_hop":
             entry = generate_multi_hop_question()
         elif question_type == "evaluation":
-            category = random.choice(categories)
             entry = generate_evaluation_question(category)
         else:
-            category = random.choice(categories)
             entry = generate_core_question(category)
         
         # Add competition metadata
-        entry["metadata"]["difficulty"] = random.choices(
-            ["easy", "medium", "hard"],
-            weights=[0.2, 0.5, 0.3]
-        )[0]
-        entry["metadata"]["competition_relevance"] = random.randint(7, 10)
+        entry["metadata"]["difficulty"] = difficulty
+        entry["metadata"]["competition_relevance"] = relevance
         entry["quality"] = {
-            "complexity": random.randint(2,5),
-            "accuracy": random.choice([0.95, 0.97, 0.99]),
-            "educational_value": random.choice(["high", "very high"])
+            "complexity": complexity,
+            "accuracy": accuracy,
+            "educational_value": educational_value
         }
         
-        dataset.append(entry)
-    
-    return dataset
+        yield entry
+
+def generate_dataset(num_entries, seed=None):
+    return list(iter_dataset(num_entries, seed=seed))
 
 # Validate and save dataset
 def validate_entry(entry):
     required_keys = ["instruction", "response", "context", "metadata"]
     return all(key in entry for key in required_keys)
 
-dataset = generate_dataset(10000)
-
-with open("competition_ready_dataset.jsonl", "w") as f:
-    for entry in dataset:
+def stream_dataset(num_entries, seed=None):
+    """Yield only validated entries, ready to be handed straight to a writer"""
+    for entry in iter_dataset(num_entries, seed=seed):
         if validate_entry(entry):
-            f.write(json.dumps(entry) + "\n")
+            yield entry
+
+def write_dataset(path, entries):
+    """Write entries to a JSONL file as they arrive and return the row count"""
+    with JsonlWriter(path) as writer:
+        return writer.write_all(entries)
+
+def write_dataset_shards(out_dir, entries, max_rows=SHARD_MAX_ROWS, max_bytes=None):
+    """Write entries to capped shards plus a manifest in `out_dir` and return the row count"""
+    with ShardedJsonlWriter(out_dir, max_rows=max_rows, max_bytes=max_bytes) as writer:
+        return writer.write_all(entries)
+
+if __name__ == "__main__":
+    # Streaming mode: rows hit disk as they are generated, memory stays flat
+    if SHARD_DIR:
+        written = write_dataset_shards(SHARD_DIR, stream_dataset(10000))
+    else:
+        written = write_dataset("competition_ready_dataset.jsonl", stream_dataset(10000))
 
-print(f"Successfully generated competition dataset with {len(dataset)} entries")
-print("Dataset Structure:")
-print("- 40% Trap Questions (Critical Thinking)")
-print("- 35% Core Concept Questions (Foundation)")
-print("- 15% Multi-Hop Reasoning (Advanced Analysis)")
-print("- 10% Evaluation Scenarios (Practical Application)")
-print("All entries include difficulty ratings and competition relevance scores")
\ No newline at end of file
+    print(f"Successfully generated competition dataset with {written} entries")
+    print("Dataset Structure:")
+    print("- 40% Trap Questions (Critical Thinking)")
+    print("- 35% Core Concept Questions (Foundation)")
+    print("- 15% Multi-Hop Reasoning (Advanced Analysis)")
+    print("- 10% Evaluation Scenarios (Practical Application)")
+    print("All entries include difficulty ratings and competition relevance scores")
\ No newline at end of file